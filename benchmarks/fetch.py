@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Measures the fetch pipeline (current weather and forecast of a city, through the
+event loop, cache and parsers) offline, against responses captured on disk.
+
+Usage: python benchmarks/fetch.py <captures> [city] [runs] [latency] [error_rate]
+
+Capture the responses first by running Halo once with the 'record' provider,
+see :meth:`halo.DataStore.DataStore.set_provider`, or pass a directory of
+responses recorded by :class:`halo.API.RecordProvider` elsewhere.
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep the settings, history and cities of the user out of the benchmark.
+os.environ['HOME'] = tempfile.mkdtemp(prefix="halo-bench-")
+
+from halo.API import API, APIError, ReplayProvider  # noqa: E402
+from halo.AsyncAPI import AsyncAPI, EventLoop  # noqa: E402
+from halo.Cache import ResponseCache  # noqa: E402
+from halo.RateLimit import RequestBudget  # noqa: E402
+
+
+async def fetch(api: AsyncAPI, city: str):
+    forecast = asyncio.ensure_future(api.get_forecast_weather(city))
+    await api.get_current_weather(city)
+    await forecast
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    directory = os.path.abspath(sys.argv[1])
+    city = sys.argv[2] if len(sys.argv) > 2 else "London,GB"
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    latency = float(sys.argv[4]) if len(sys.argv) > 4 else 0.0
+    error_rate = float(sys.argv[5]) if len(sys.argv) > 5 else 0.0
+
+    API.configure_budget(RequestBudget(per_minute=10 ** 9, per_day=10 ** 9))
+    loop = EventLoop()
+    timings = []
+    errors = 0
+    for _ in range(runs):
+        # A new cache every run, so every run goes through the provider.
+        api = AsyncAPI(ReplayProvider(ResponseCache(':memory:'), directory, latency, error_rate, seed=len(timings)),
+                       loop)
+        start = time.perf_counter()
+        try:
+            api.submit(fetch(api, city)).result()
+        except APIError:
+            errors += 1
+        timings.append(time.perf_counter() - start)
+    loop.stop()
+
+    timings.sort()
+    print("runs {}  errors {}".format(runs, errors))
+    print("mean {:.2f} ms  p50 {:.2f} ms  p95 {:.2f} ms  max {:.2f} ms".format(
+        statistics.mean(timings) * 1e3, timings[len(timings) // 2] * 1e3,
+        timings[int(len(timings) * 0.95)] * 1e3, timings[-1] * 1e3))
+
+
+if __name__ == '__main__':
+    main()
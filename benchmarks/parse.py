@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Compares parsing a forecast or history response fully with `json.loads` against
+the streaming parser of :mod:`halo.Stream`, in time and peak memory.
+
+Usage: python benchmarks/parse.py [response.json] [items]
+
+With a recorded response the file is parsed as is, otherwise a synthetic
+response of `items` data points (default 50000) is generated.
+"""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from halo.Series import WeatherSeries  # noqa: E402
+from halo.Stream import iter_array  # noqa: E402
+
+CHUNK_SIZE = 16 * 1024
+
+
+def synthetic_response(items: int) -> bytes:
+    item = {"dt": 1573992000, "main": {"temp": 33.1, "temp_min": 28.57, "temp_max": 33.1, "pressure": 1010,
+                                       "sea_level": 1010, "grnd_level": 1009, "humidity": 78, "temp_kf": 4.53},
+            "weather": [{"id": 500, "main": "Rain", "description": "light rain", "icon": "10d"}],
+            "clouds": {"all": 57}, "wind": {"speed": 4.09, "deg": 321}, "rain": {"3h": 1.44},
+            "sys": {"pod": "d"}, "dt_txt": "2019-11-17 12:00:00"}
+    return json.dumps({"cod": "200", "message": 0, "cnt": items, "list": [item] * items,
+                       "city": {"id": 1254187, "name": "Thrissur", "country": "IN"}}).encode()
+
+
+def chunks(body: bytes):
+    for i in range(0, len(body), CHUNK_SIZE):
+        yield body[i:i + CHUNK_SIZE]
+
+
+def full(body: bytes) -> WeatherSeries:
+    # The current path joins the downloaded chunks and decodes the whole document.
+    return WeatherSeries.from_items(json.loads(b''.join(chunks(body)).decode('utf-8'))['list'])
+
+
+def streaming(body: bytes) -> WeatherSeries:
+    return WeatherSeries.from_items(iter_array(chunks(body), 'list'))
+
+
+def measure(fn, body: bytes):
+    tracemalloc.start()
+    start = time.perf_counter()
+    series = fn(body)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return series, elapsed, peak
+
+
+def main():
+    if len(sys.argv) > 1 and os.path.isfile(sys.argv[1]):
+        with open(sys.argv[1], 'rb') as f:
+            body = f.read()
+    else:
+        body = synthetic_response(int(sys.argv[-1]) if len(sys.argv) > 1 else 50000)
+    print("response: {:.1f} MB".format(len(body) / 1e6))
+    results = []
+    for name, fn in (("json.loads", full), ("streaming", streaming)):
+        series, elapsed, peak = measure(fn, body)
+        results.append(list(series.temp))
+        print("{:<11} {:8.3f}s  peak {:8.1f} MB  {} points".format(name, elapsed, peak / 1e6, len(series)))
+    assert results[0] == results[1], "Parsers disagree."
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Measures the time from launching `python -m halo` until the main window is first painted.
+
+Usage: python benchmarks/startup.py [runs]
+
+Needs a display, e.g. run it under `xvfb-run -a` on headless machines.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure() -> float:
+    """
+    Launches the app once.
+
+    :return: seconds until first paint.
+    """
+    env = dict(os.environ, HALO_EXIT_AFTER_PAINT="1")
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "halo"], cwd=ROOT, env=env,
+                            stdout=subprocess.PIPE, universal_newlines=True)
+    for line in proc.stdout:
+        if line.startswith("first-paint"):
+            elapsed = time.perf_counter() - start
+            break
+    else:
+        raise RuntimeError("Halo exited before painting its window.")
+    proc.wait()
+    return elapsed
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    times = [measure() for _ in range(runs)]
+    print("first paint over {} runs: min {:.3f}s, median {:.3f}s, max {:.3f}s".format(
+        runs, min(times), statistics.median(times), max(times)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,50 @@
+import concurrent.futures
+import hashlib
+import itertools
+import json
+import os
+import random
+import threading
+import time
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Tuple, Dict, Any
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from typing import Tuple, Dict, Any, Callable, Optional, List, Union, Iterator, Type
 
 import pytz
 import requests
+from requests.adapters import HTTPAdapter
 
+from halo.Cache import ResponseCache
+from halo.CityIndex import CityIndex
+from halo.Conditions import get_condition
 from halo.DataStore import DataStore
+from halo.History import HistoryStore
+from halo.RateLimit import RequestBudget
+from halo.Retry import RetryPolicy, CircuitBreaker
+from halo.Series import WeatherSeries
+from halo.SingleFlight import SingleFlight
+from halo.Stream import iter_array
+from halo.Timezone import resolve_timezone
+from halo.settings import HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, CACHE_TTL, CACHE_STALE_TTL, \
+    BATCH_WORKERS, STREAMING_PARSE, STREAM_CHUNK_SIZE, DEFAULT_PROVIDER, REPLAY_DIRECTORY, REPLAY_LATENCY, \
+    REPLAY_ERROR_RATE, REPLAY_LOCATION, REMOTE_URL
+
+
+def create_session(pool_size: int = HTTP_POOL_SIZE) -> requests.Session:
+    """
+    Creates a keep-alive http session with a connection pool.
+
+    :param pool_size: Maximum number of connections kept open per host.
+    :return: session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+    return session
 
 
 class API(ABC):
@@ -14,11 +53,116 @@ class API(ABC):
     Currently it implements fetching current weather, forecast and 1 day
     historic weather data (disabled for now as not in free plan) .
     """
+    name = None  # type: str
+    """ name the provider is registered under."""
     has_historical = False
     has_ip_support = False
-
-    def __init__(self):
+    timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    """ connect and read timeout in seconds."""
+    streaming = STREAMING_PARSE
+    """ set this to true to parse series incrementally as the response arrives."""
+
+    __session = None
+    __session_lock = threading.Lock()
+    __budget = None
+    __circuit = None
+    __in_flight = SingleFlight()
+
+    def __init__(self, cache: ResponseCache = None):
+        """
+        :param cache: Response cache, defaults to the on-disk cache of the app.
+        """
         self._headers = {'Accept': 'application/json', 'Accept-Charset': 'UTF-8'}
+        self.cache = cache if cache is not None else ResponseCache()
+        self.retry = RetryPolicy(retry_on=(ServiceUnavailable,))
+        """ retries of requests failing as the service is unavailable."""
+        self.stale_while_revalidate = True
+        """ serve expired responses right away and refresh them in background."""
+        self.on_revalidated = None  # type: Optional[Callable[[str, str, str], None]]
+        """ called from a background thread with the cache key once a stale response is refreshed."""
+        self.__revalidating = set()
+        self.__revalidating_lock = threading.Lock()
+
+    @staticmethod
+    def get_session() -> requests.Session:
+        """
+        Returns the http session shared by all the providers so that
+        connections are reused across requests.
+
+        :return: session
+        """
+        with API.__session_lock:
+            if API.__session is None:
+                API.__session = create_session()
+            return API.__session
+
+    @staticmethod
+    def configure_session(pool_size: int = HTTP_POOL_SIZE, connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+                          read_timeout: float = HTTP_READ_TIMEOUT):
+        """
+        Replaces the shared session with one using the given pool size and timeouts.
+
+        :param pool_size: Maximum number of connections kept open per host.
+        :param connect_timeout: Seconds to wait for a connection to be established.
+        :param read_timeout: Seconds to wait for the server to send data.
+        """
+        with API.__session_lock:
+            if API.__session is not None:
+                API.__session.close()
+            API.__session = create_session(pool_size)
+            API.timeout = (connect_timeout, read_timeout)
+
+    @staticmethod
+    def get_budget() -> RequestBudget:
+        """
+        Returns the request budget of the api key shared by all the providers.
+
+        :return: budget
+        """
+        with API.__session_lock:
+            if API.__budget is None:
+                API.__budget = RequestBudget()
+            return API.__budget
+
+    @staticmethod
+    def configure_budget(budget: RequestBudget):
+        """
+        Replaces the shared request budget, like one with other limits.
+
+        :param budget: budget
+        """
+        with API.__session_lock:
+            API.__budget = budget
+
+    @staticmethod
+    def get_circuit() -> CircuitBreaker:
+        """
+        Returns the circuit breaker shared by all the providers.
+
+        :return: circuit breaker
+        """
+        with API.__session_lock:
+            if API.__circuit is None:
+                API.__circuit = CircuitBreaker()
+            return API.__circuit
+
+    @staticmethod
+    def configure_circuit(circuit: CircuitBreaker):
+        """
+        Replaces the shared circuit breaker, like one with other thresholds.
+
+        :param circuit: circuit breaker
+        """
+        with API.__session_lock:
+            API.__circuit = circuit
+
+    def get_location(self) -> str:
+        """
+        Detects the city of the user, used when the provider has no ip support.
+
+        :return: search query of the city
+        """
+        return get_location()
 
     @abstractmethod
     def get_current_weather(self, city: str) -> Tuple[str, str, Dict[str, Any]]:
@@ -31,7 +175,7 @@ class API(ABC):
         pass
 
     @abstractmethod
-    def get_forecast_weather(self, query: str) -> list:
+    def get_forecast_weather(self, query: str) -> WeatherSeries:
         """
         Fetches and returns the forecast weather data.
 
@@ -41,7 +185,7 @@ class API(ABC):
         pass
 
     @abstractmethod
-    def get_weather_history(self, query: str, tz: str) -> list:
+    def get_weather_history(self, query: str, tz: str) -> WeatherSeries:
         """
         Fetches and returns the historic weather data(1 day).
 
@@ -51,6 +195,49 @@ class API(ABC):
         """
         pass
 
+    def get_current_weather_batch(self, cities: List[str]) -> Dict[str, Union[tuple, 'APIError']]:
+        """
+        Fetches current weather data of many cities at once.
+
+        :param cities: list of search queries
+        :return: a dict mapping each query to the result of :meth:`get_current_weather`
+        or the :class:`APIError` raised while fetching it.
+        """
+        return self._map_concurrently(self.get_current_weather, cities)
+
+    def get_forecast_weather_batch(self, cities: List[str]) -> Dict[str, Union[WeatherSeries, 'APIError']]:
+        """
+        Fetches forecast weather data of many cities at once.
+
+        :param cities: list of search queries
+        :return: a dict mapping each query to the result of :meth:`get_forecast_weather`
+        or the :class:`APIError` raised while fetching it.
+        """
+        return self._map_concurrently(self.get_forecast_weather, cities)
+
+    @staticmethod
+    def _map_concurrently(fn: Callable[[str], Any], queries: List[str],
+                          workers: int = BATCH_WORKERS) -> Dict[str, Any]:
+        """
+        Calls fn for each query with at most `workers` calls in flight.
+
+        :param fn: endpoint function
+        :param queries: list of search queries
+        :param workers: maximum concurrent calls
+        :return: a dict mapping each query to its result or the :class:`APIError` raised.
+        """
+        results = {}
+        if not queries:
+            return results
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(workers, len(queries))) as exe:
+            futures = {query: exe.submit(fn, query) for query in queries}
+        for query, future in futures.items():
+            try:
+                results[query] = future.result()
+            except APIError as e:
+                results[query] = e
+        return results
+
     @abstractmethod
     def _url_format(self, slug: str, query: str, city_tz: str = None, days_count: int = 1) -> str:
         pass
@@ -65,6 +252,200 @@ class API(ABC):
         """
         pass
 
+    def _stream_request(self, url: str, parent: str = "data") -> Iterator[bytes]:
+        """
+        Return data from end point as chunks of json text while it arrives.
+        Providers which can't stream return the whole response as one chunk.
+
+        :param url:
+        :param parent:
+        :return:
+        """
+        yield json.dumps(self._send_request(url, parent)).encode()
+
+    def _cache_key(self, slug: str, query: str, city_tz: str = None) -> Tuple[str, str, str]:
+        """Return the cache key of a request: slug, query and units."""
+        return slug, query if city_tz is None else query + "@" + city_tz, DataStore.get_units()
+
+    def _cached_request(self, slug: str, query: str, parent: str = "data", city_tz: str = None) -> Any:
+        """
+        Return data from the cache while it's fresh, otherwise from end point.
+
+        :param slug: endpoint slug
+        :param query: search query
+        :param parent: name of data used in error messages
+        :param city_tz: city timezone
+        :return: decoded response
+        """
+        key = self._cache_key(slug, query, city_tz)
+        url = self._url_format(slug, query, city_tz)
+        entry = self.cache.get(*key)
+        cached = self._from_cache(entry, key, url, parent)
+        if cached is not None:
+            return cached
+        try:
+            data = self._request(url, parent)
+        except ServiceUnavailable:
+            if entry is None:
+                raise
+            return entry[0]  # Old data is better than none while the service is down.
+        self.cache.put(*key, data)
+        return data
+
+    def _cached_stream(self, slug: str, query: str, parent: str = "data", city_tz: str = None) \
+            -> Iterator[Union[bytes, str]]:
+        """
+        Like :meth:`_cached_request`, but yields the json text of the response in chunks.
+        The response is cached once all of it has been consumed.
+
+        :param slug: endpoint slug
+        :param query: search query
+        :param parent: name of data used in error messages
+        :param city_tz: city timezone
+        :return: chunks of json text
+        """
+        key = self._cache_key(slug, query, city_tz)
+        url = self._url_format(slug, query, city_tz)
+        cached = self._from_cache(self.cache.get_raw(*key), key, url, parent)
+        if cached is not None:
+            yield cached
+            return
+        # Streams aren't retried as their start may already have been consumed.
+        self._spend_request()  # Before the circuit is asked, as it may hand out its only probe.
+        circuit = self.get_circuit()
+        if not circuit.allow():
+            raise ServiceUnavailable(ServiceUnavailable.message)
+        chunks = []
+        outcome = circuit.record_success
+        try:
+            for chunk in self._stream_request(url, parent):
+                chunks.append(chunk)
+                yield chunk
+        except RateLimitReached:
+            self.get_budget().exhaust()
+            raise
+        except ServiceUnavailable:
+            outcome = circuit.record_failure
+            raise
+        finally:
+            outcome()  # However the stream ends, even abandoned, so a probe is never left pending.
+        self.cache.put_raw(*key, b''.join(chunks).decode('utf-8'))
+
+    def _from_cache(self, cached: Optional[Tuple[Any, float]], key: Tuple[str, str, str], url: str,
+                    parent: str) -> Any:
+        """
+        Decides whether a cached response can be used.
+
+        :param cached: a tuple of the cached response and its age or None.
+        :param key: cache key
+        :param url: endpoint url
+        :param parent: name of data used in error messages
+        :return: the cached response or None if it must be fetched.
+        """
+        if cached is None:
+            return None
+        data, age = cached
+        if age < CACHE_TTL.get(key[0], 0):
+            return data
+        if self.get_budget().is_low():
+            return data  # The requests left are kept for data we don't have at all.
+        if self.get_circuit().is_open():
+            return data  # The service is down, so don't even try.
+        if self.stale_while_revalidate and age < CACHE_STALE_TTL:
+            self._revalidate(key, url, parent)
+            return data
+        return None
+
+    def _series_request(self, slug: str, query: str, parent: str = "data", city_tz: str = None) -> WeatherSeries:
+        """
+        Return the 'list' of a response as a series, parsing it while it arrives if streaming is on.
+
+        :param slug: endpoint slug
+        :param query: search query
+        :param parent: name of data used in error messages
+        :param city_tz: city timezone
+        :return: series
+        """
+        if not self.streaming:
+            return WeatherSeries.from_items(self._cached_request(slug, query, parent, city_tz)['list'])
+        try:
+            return WeatherSeries.from_items(iter_array(self._cached_stream(slug, query, parent, city_tz), 'list'))
+        except (ValueError, KeyError):
+            raise APIError("Invalid response from server. Please try again later.")
+
+    def _spend_request(self):
+        """Raises :class:`RateLimitReached` unless the request budget allows one more request."""
+        if not self.get_budget().acquire():
+            raise RateLimitReached("Too many requests were made recently. Please wait a minute or go to "
+                                   "Menu -> Preference and enter your own API key.")
+
+    def _request(self, url: str, parent: str = "data") -> Any:
+        """
+        Sends a request within the budget, retrying it while the service is unavailable.
+        Identical requests made while it's in flight wait for its response instead of being sent again.
+
+        :param url: endpoint url
+        :param parent: name of data used in error messages
+        :return: decoded response
+        """
+        return API.__in_flight.do(url, self.__send_with_retries, url, parent)
+
+    def __send_with_retries(self, url: str, parent: str) -> Any:
+        self._spend_request()  # Before the circuit is asked, as it may hand out its only probe.
+        circuit = self.get_circuit()
+        if not circuit.allow():
+            raise ServiceUnavailable(ServiceUnavailable.message)
+        attempts = itertools.count()
+
+        def attempt():
+            if next(attempts):
+                self._spend_request()  # Every retry is a request of its own.
+            return self.__send(url, parent)
+
+        # Any other error means the service has answered, even if not with data.
+        outcome = circuit.record_success
+        try:
+            return self.retry.call(attempt)
+        except ServiceUnavailable:
+            outcome = circuit.record_failure
+            raise
+        finally:
+            outcome()
+
+    def __send(self, url: str, parent: str) -> Any:
+        try:
+            return self._send_request(url, parent)
+        except RateLimitReached:
+            self.get_budget().exhaust()
+            raise
+
+    def _revalidate(self, key: Tuple[str, str, str], url: str, parent: str):
+        """
+        Refreshes a stale cache entry in background.
+
+        :param key: cache key
+        :param url: endpoint url
+        :param parent: name of data used in error messages
+        """
+        with self.__revalidating_lock:
+            if key in self.__revalidating:
+                return
+            self.__revalidating.add(key)
+
+        def run():
+            try:
+                data = self._request(url, parent)
+            except APIError:
+                return  # Keep serving the stale response.
+            finally:
+                with self.__revalidating_lock:
+                    self.__revalidating.discard(key)
+            self.cache.put(*key, data)
+            if self.on_revalidated is not None:
+                self.on_revalidated(*key)
+
+        threading.Thread(target=run, daemon=True).start()
+
 
 class APIError(Exception):
     """
@@ -88,15 +469,57 @@ class RateLimitReached(APIError):
     pass
 
 
+class ServiceUnavailable(APIError):
+    """
+    The API service couldn't be reached or failed on its side, so the request may succeed when retried.
+    """
+    message = "Something went wrong. Check your internet connection or please try again later."
+
+
+PROVIDERS = {}  # type: Dict[str, Type[API]]
+
+
+def register_provider(name: str) -> Callable[[Type[API]], Type[API]]:
+    """
+    A class decorator which registers a provider under the given name.
+
+    :param name: provider name stored in settings
+    """
+    def register(cls: Type[API]) -> Type[API]:
+        cls.name = name
+        PROVIDERS[name] = cls
+        return cls
+    return register
+
+
+def create_provider(name: str = None, cache: ResponseCache = None) -> API:
+    """
+    Creates a registered provider.
+
+    :param name: provider name, defaults to the one chosen in settings.
+    :param cache: Response cache, defaults to the on-disk cache of the app.
+    :return: provider
+    """
+    if name is None:
+        name = DataStore().get_provider()
+    if name not in PROVIDERS:
+        print("Unknown weather provider %s. Using %s instead." % (name, DEFAULT_PROVIDER))
+        name = DEFAULT_PROVIDER
+    return PROVIDERS[name](cache)
+
+
+@register_provider('openweathermap')
 class OpenWeatherMap(API):
     """
     Implements openweathermap.org
     """
     has_historical = False
     """ set this to true if you have a paid api key."""
+    group_size = 20
+    """ maximum number of city ids accepted by the group endpoint."""
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, cache: ResponseCache = None):
+        super().__init__(cache)
         self._base_url = "https://api.openweathermap.org/data/2.5"
 
     @staticmethod
@@ -113,62 +536,102 @@ class OpenWeatherMap(API):
 
     @staticmethod
     def get_icons(icon):
-        if icon == '11d' or icon == '11n':
-            return 201
-        elif icon == '01d' or icon == '01n':
-            return 800
-        elif icon == '02d' or icon == '02n':
-            return 801
-        elif icon == '03d' or icon == '03n':
-            return 804
-        elif icon == '04d' or icon == '04n':
-            return 804
-        elif icon == '09d' or icon == '09n':
-            return 300
-        elif icon == '10d' or icon == '10n':
-            return 500
-        elif icon == '13d' or icon == '13n':
-            return 600
-        elif icon == '50d' or icon == '50n':
-            return 731
-        else:
-            return None
+        condition = get_condition('openweathermap', icon)
+        return condition.code if condition is not None else None
+
+    @staticmethod
+    def _query(city: str) -> str:
+        """
+        Returns the query of a city, by its id when the city is known so the exact city is fetched.
+
+        :param city: city name, optionally followed by a comma and its country code
+        :return: query parameter
+        """
+        city_id = OpenWeatherMap._city_id(city, DataStore().get_city_ids())
+        return "q={}".format(city) if city_id is None else "id={}".format(city_id)
+
+    @staticmethod
+    def _city_id(city: str, ids: Dict[str, int]) -> Optional[int]:
+        """
+        Looks up the id of a city written either like London,GB or like London, GB as shown in the app.
+
+        :param city: city name, optionally followed by a comma and its country code
+        :param ids: the ids known, see :meth:`DataStore.get_city_ids`
+        :return: id or None
+        """
+        return ids.get(city.replace(", ", ","))
 
     def get_current_weather(self, query):
         if query is None:
             query = "q=London,GB"
         else:
-            query = "q={}".format(query)
-        res = self._send_request(self._url_format("weather", query), "weather info")
+            query = self._query(query)
+        return self._parse_current(self._cached_request("weather", query, "weather info"))
+
+    def get_current_weather_batch(self, cities):
+        ids = DataStore().get_city_ids()
+        by_id = {}
+        unknown = []
+        for city in cities:
+            city_id = self._city_id(city, ids)
+            if city_id is not None:
+                by_id.setdefault(city_id, []).append(city)
+            else:
+                unknown.append(city)
+
+        # Cities we have seen before are fetched in groups by their id.
+        results = super().get_current_weather_batch(unknown)
+        id_list = sorted(by_id)
+        for i in range(0, len(id_list), self.group_size):
+            chunk = id_list[i:i + self.group_size]
+            try:
+                res = self._cached_request("group", "id=" + ",".join(map(str, chunk)), "weather info")
+            except APIError as e:
+                for city_id in chunk:
+                    results.update(dict.fromkeys(by_id[city_id], e))
+                continue
+            for item in res['list']:
+                if item['id'] in by_id:
+                    # Also kept as the response of the city alone, so switching to it is served from cache.
+                    self.cache.put(*self._cache_key("weather", "id={}".format(item['id'])), item)
+                    results.update(dict.fromkeys(by_id[item['id']], self._parse_current(item)))
+        for city in cities:
+            if city not in results:
+                results[city] = NotFound("The weather information for the requested city is not found.")
+        return results
+
+    def _parse_current(self, res: Dict[str, Any]) -> Tuple[str, str, Dict[str, Any]]:
+        """
+        Extracts the current weather from a response and remembers the city.
+
+        :param res: decoded response of a city
+        :return: a tuple containing city, city timezone, current weather data.
+        """
         current_weather = {
             'status': res['weather'][0]['main'],
             'code': self.get_icons(res['weather'][0]['icon']),
             'temp': res['main']['temp']
         }
         city = res['name'] + ", " + res['sys']['country']
-        if res['sys']['country'] in pytz.country_timezones:
-            city_tz = pytz.country_timezones(res['sys']['country'])[0]
-        else:
-            city_tz = pytz.utc
-        DataStore().add_city((res['name'], res['sys']['country']))
+        coord = res.get('coord', {})
+        city_tz = resolve_timezone(coord.get('lat'), coord.get('lon'), res.get('timezone'), res['sys']['country'])
+        # An observation already seen, like one served from cache, has nothing new to be written.
+        if DataStore().observe(city, res.get('dt')):
+            DataStore().add_city((res['name'], res['sys']['country']), res.get('id'))
+            CityIndex().add(res['name'], res['sys']['country'], coord.get('lat'), coord.get('lon'), res.get('id'))
+            HistoryStore().record(city, WeatherSeries.from_items([res])[0])
 
         return city, city_tz, current_weather
 
-    def get_forecast_weather(self, city: str) -> tuple:
+    def get_forecast_weather(self, city: str) -> WeatherSeries:
         if city is None:
             query = "q=London,GB"
         else:
-            query = "q={}".format(city)
-        res = self._send_request(self._url_format("forecast", query), "forecast data")
-        forecast_weather = res['list']
-        chart_data = [item['main']['temp'] for item in res['list']]
-        return forecast_weather, chart_data
-
-    def get_weather_history(self, city: str, tz: str) -> tuple:
-        res = self._send_request(self._url_format("history", city, tz), "historic data")
-        history_weather = res['list']
-        history_chart_data = [item['main']['temp'] for item in res['list']]
-        return history_weather, history_chart_data
+            query = self._query(city)
+        return self._series_request("forecast", query, "forecast data")
+
+    def get_weather_history(self, city: str, tz: str) -> WeatherSeries:
+        return self._series_request("history", city, "historic data", tz)
 
     def _url_format(self, slug: str, query: str, city_tz: str = None, days_count: int = 5) -> str:
         if city_tz:
@@ -187,31 +650,180 @@ class OpenWeatherMap(API):
 
     def _send_request(self, url: str, parent: str = "data") -> Any:
         try:
-            r = requests.get(url, headers=self._headers)
-            if r.status_code == 200:
-                try:
-                    return r.json()
-                except ValueError:
-                    raise APIError("Invalid response from server. Please try again later.")
-            elif r.status_code == 204:
-                raise NotFound("The weather information for the requested city is not found.")
-            elif r.status_code == 429:
-                raise RateLimitReached("The API rate limit has reached. Please wait until it resets or go to "
-                                       "Menu -> Preference and enter your own API key.")
-            else:
-                raise APIError("Unable to fetch %s. Please make sure your API key given in Menu -> Preference is "
-                               "valid or try again later." % parent)
-        except requests.ConnectionError:
-            raise APIError("Something went wrong. Check your internet connection or please try again later.")
+            r = self.get_session().get(url, headers=self._headers, timeout=self.timeout)
+            self._check_response(r, parent)
+            try:
+                return r.json()
+            except ValueError:
+                raise APIError("Invalid response from server. Please try again later.")
+        except (requests.ConnectionError, requests.Timeout):
+            raise ServiceUnavailable(ServiceUnavailable.message)
+
+    def _stream_request(self, url: str, parent: str = "data") -> Iterator[bytes]:
+        try:
+            r = self.get_session().get(url, headers=self._headers, timeout=self.timeout, stream=True)
+            with r:
+                self._check_response(r, parent)
+                yield from r.iter_content(STREAM_CHUNK_SIZE)
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+            raise ServiceUnavailable(ServiceUnavailable.message)
+
+    @staticmethod
+    def _check_response(r: requests.Response, parent: str):
+        """
+        Raises the error matching the status of a response.
+
+        :param r: response
+        :param parent: name of data used in error messages
+        """
+        if r.status_code == 200:
+            return
+        elif r.status_code in (204, 404):
+            raise NotFound("The weather information for the requested city is not found.")
+        elif r.status_code == 429:
+            raise RateLimitReached("The API rate limit has reached. Please wait until it resets or go to "
+                                   "Menu -> Preference and enter your own API key.")
+        elif r.status_code >= 500:
+            raise ServiceUnavailable("The weather service is not available right now. Please try again later.")
+        else:
+            raise APIError("Unable to fetch %s. Please make sure your API key given in Menu -> Preference is "
+                           "valid or try again later." % parent)
 
 
-def get_location():
-    res = requests.get('https://ipapi.co/json/')
-    if res.status_code == 200:
+@register_provider('replay')
+class ReplayProvider(OpenWeatherMap):
+    """
+    Serves responses captured by :class:`RecordProvider` from disk instead of the network,
+    so that the whole fetch pipeline can be run and measured offline.
+    """
+    record = False
+    """ set this to true to fetch responses from the network and capture them."""
+
+    def __init__(self, cache: ResponseCache = None, directory: str = REPLAY_DIRECTORY,
+                 latency: float = REPLAY_LATENCY, error_rate: float = REPLAY_ERROR_RATE, seed: int = None):
+        """
+        :param cache: Response cache, defaults to the on-disk cache of the app.
+        :param directory: directory of the captured responses
+        :param latency: seconds each replayed request takes
+        :param error_rate: share of the replayed requests failing with :class:`ServiceUnavailable`.
+        :param seed: seed of the random errors, to fail the same requests on every run.
+        """
+        super().__init__(cache)
+        self.directory = directory
+        self.latency = latency
+        self.error_rate = error_rate
+        self.__random = random.Random(seed)
+
+    def get_location(self) -> str:
+        return REPLAY_LOCATION if not self.record else super().get_location()
+
+    def capture_path(self, url: str) -> str:
+        """
+        Returns the file of the response of a url. The api key and time range are left out,
+        so captures can be replayed with any key and on any day.
+
+        :param url: endpoint url
+        :return: file path
+        """
+        parts = urlsplit(url)
+        params = sorted((k, v) for k, v in parse_qsl(parts.query) if k not in ('appid', 'start', 'end'))
+        digest = hashlib.sha1((parts.path + "?" + urlencode(params)).encode()).hexdigest()[:16]
+        return os.path.join(self.directory, "{}-{}.json".format(parts.path.rsplit('/', 1)[-1], digest))
+
+    def _send_request(self, url: str, parent: str = "data") -> Any:
+        if self.record:
+            data = super()._send_request(url, parent)
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.capture_path(url), 'w') as f:
+                json.dump(data, f)
+            return data
+
+        time.sleep(self.latency)
+        if self.__random.random() < self.error_rate:
+            raise ServiceUnavailable(ServiceUnavailable.message)
         try:
+            with open(self.capture_path(url)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise NotFound("No response of the %s requested has been captured." % parent)
+        except ValueError:
+            raise APIError("Invalid response from server. Please try again later.")
+
+    def _stream_request(self, url: str, parent: str = "data") -> Iterator[bytes]:
+        yield json.dumps(self._send_request(url, parent)).encode()
+
+
+@register_provider('record')
+class RecordProvider(ReplayProvider):
+    """
+    Implements openweathermap.org while capturing every response for :class:`ReplayProvider`.
+    """
+    record = True
+
+
+@register_provider('remote')
+class RemoteProvider(OpenWeatherMap):
+    """
+    Fetches from a Halo server (see :mod:`halo.Server`), so that many instances share
+    the cache and the api key of the server. Responses are revalidated with their ETag.
+    """
+    has_historical = True
+    etag_entries = 256
+    """ maximum number of responses kept for revalidation."""
+
+    def __init__(self, cache: ResponseCache = None, url: str = REMOTE_URL):
+        """
+        :param cache: Response cache, defaults to the on-disk cache of the app.
+        :param url: base url of the server
+        """
+        super().__init__(cache)
+        self._base_url = url.rstrip('/')
+        self.__responses = OrderedDict()  # type: OrderedDict
+        self.__responses_lock = threading.Lock()
+
+    def get_weather_history(self, city: str, tz: str) -> WeatherSeries:
+        query = "q={}&tz={}".format(city if city is not None else "London,GB", tz)
+        series = WeatherSeries()
+        for item in self._cached_request("history", query, "historic data")['list']:
+            series.append(**item)
+        return series
+
+    def _spend_request(self):
+        pass  # The server spends the api key, not us.
+
+    def _send_request(self, url: str, parent: str = "data") -> Any:
+        headers = dict(self._headers)
+        with self.__responses_lock:
+            known = self.__responses.get(url)
+        if known is not None:
+            headers['If-None-Match'] = known[0]
+        try:
+            r = self.get_session().get(url, headers=headers, timeout=self.timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            raise ServiceUnavailable(ServiceUnavailable.message)
+        if r.status_code == 304 and known is not None:
+            return known[1]
+        self._check_response(r, parent)
+        try:
+            data = r.json()
+        except ValueError:
+            raise APIError("Invalid response from server. Please try again later.")
+        etag = r.headers.get('ETag')
+        if etag:
+            with self.__responses_lock:
+                self.__responses[url] = (etag, data)
+                self.__responses.move_to_end(url)
+                if len(self.__responses) > self.etag_entries:
+                    self.__responses.popitem(last=False)
+        return data
+
+
+def get_location():
+    try:
+        res = API.get_session().get('https://ipapi.co/json/', timeout=API.timeout)
+        if res.status_code == 200:
             r = res.json()
             return r['city'] + "," + r['country']
-        except ValueError:
-            pass
-    else:
-        return 'Kochi,IN'
+    except (requests.ConnectionError, requests.Timeout, ValueError, KeyError, TypeError):
+        pass
+    return 'Kochi,IN'  # Whatever went wrong, a city is better than none.
@@ -0,0 +1,161 @@
+"""
+Asyncio interface to the weather providers.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Callable, Coroutine, Dict, Optional, Tuple
+
+from halo.API import API
+from halo.Series import WeatherSeries
+from halo.settings import IO_WORKERS, REQUEST_TIMEOUT
+
+
+class EventLoop:
+    """
+    A long lived asyncio event loop running in its own thread.
+    Blocking provider calls are run on a shared pool of worker threads,
+    so concurrent refreshes never have to create threads of their own.
+    """
+    __default = None
+    __default_lock = threading.Lock()
+
+    def __init__(self, dispatch: Callable[..., Any] = None):
+        """
+        Starts the event loop.
+
+        :param dispatch: Function used to hand completion callbacks over to
+        the caller's main loop, like :func:`GLib.idle_add`. By default callbacks
+        are run on the thread completing the future.
+        """
+        self.dispatch = dispatch
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=IO_WORKERS)
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(self.executor)
+        self.__thread = threading.Thread(target=self.__run, name="halo-event-loop", daemon=True)
+        self.__thread.start()
+
+    def __run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    @staticmethod
+    def get_default() -> 'EventLoop':
+        """
+        Returns the event loop shared by the whole process.
+
+        :return: event loop
+        """
+        with EventLoop.__default_lock:
+            if EventLoop.__default is None:
+                EventLoop.__default = EventLoop()
+            return EventLoop.__default
+
+    @staticmethod
+    def configure_dispatch(dispatch: Callable[..., Any]):
+        """
+        Hands the completion callbacks of the shared event loop over to a main loop,
+        like the GTK one with :func:`GLib.idle_add`.
+
+        :param dispatch: function called with the callback and its arguments.
+        """
+        EventLoop.get_default().dispatch = dispatch
+
+    def add_done_callback(self, future: concurrent.futures.Future,
+                          done: Callable[[concurrent.futures.Future], Any]):
+        """
+        Calls done with the future once it completes, through :attr:`dispatch` when set.
+
+        :param future: future of the event loop or of its worker threads.
+        :param done: callback, which must return a false value when dispatched to GLib.
+        """
+        if self.dispatch is None:
+            future.add_done_callback(done)
+        else:
+            future.add_done_callback(lambda f: self.dispatch(done, f))
+
+    def submit(self, coro: Coroutine, done: Callable[[concurrent.futures.Future], Any] = None) \
+            -> concurrent.futures.Future:
+        """
+        Schedules a coroutine on the event loop.
+
+        :param coro: coroutine
+        :param done: called with the future once the coroutine completes.
+        :return: a future which can be waited upon or cancelled from any thread.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        if done is not None:
+            self.add_done_callback(future, done)
+        return future
+
+    def stop(self):
+        """Stops the event loop and its worker threads."""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.__thread.join()
+        self.executor.shutdown(wait=False)
+
+
+class AsyncAPI:
+    """
+    Wraps an :class:`API` provider so that each of its endpoints can be awaited.
+    """
+
+    def __init__(self, api: API, loop: EventLoop = None, timeout: float = REQUEST_TIMEOUT):
+        """
+        :param api: provider
+        :param loop: event loop to run on, defaults to the shared one.
+        :param timeout: Seconds after which a call is abandoned with :class:`asyncio.TimeoutError`.
+        """
+        self.api = api
+        self.loop = loop if loop is not None else EventLoop.get_default()
+        self.timeout = timeout
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        Runs a blocking function on the worker threads.
+
+        :param fn: function
+        :param args: arguments of function
+        :return: return value of function
+        """
+        return await asyncio.wait_for(asyncio.get_event_loop().run_in_executor(None, fn, *args), self.timeout)
+
+    async def get_current_weather(self, city: Optional[str]) -> Tuple[str, str, Dict[str, Any]]:
+        """
+        Fetches and returns current weather data.
+
+        :param city: Can be none.
+        :return: a tuple containing city, city timezone, current weather data.
+        """
+        return await self.run(self.api.get_current_weather, city)
+
+    async def get_forecast_weather(self, query: Optional[str]) -> WeatherSeries:
+        """
+        Fetches and returns the forecast weather data.
+
+        :param query: search query
+        :return: forecast weather data.
+        """
+        return await self.run(self.api.get_forecast_weather, query)
+
+    async def get_weather_history(self, query: Optional[str], tz: str) -> WeatherSeries:
+        """
+        Fetches and returns the historic weather data(1 day).
+
+        :param query: search query
+        :param tz: city timezone
+        :return: historic weather data.
+        """
+        return await self.run(self.api.get_weather_history, query, tz)
+
+    def submit(self, coro: Coroutine, done: Callable[[concurrent.futures.Future], Any] = None) \
+            -> concurrent.futures.Future:
+        """
+        Schedules a coroutine on the event loop of this provider.
+
+        :param coro: coroutine
+        :param done: called with the future once the coroutine completes.
+        :return: future
+        """
+        return self.loop.submit(coro, done)
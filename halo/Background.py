@@ -0,0 +1,50 @@
+import gi
+
+gi.require_version("GdkPixbuf", "2.0")
+from gi.repository import GdkPixbuf  # noqa: E402
+
+
+class Background:
+    """
+    Scales the background image to the window size.
+
+    The decoded image is kept in memory along with a chain of mip levels,
+    each half the size of the previous one, so a resize only scales the
+    smallest level which is still larger than the window.
+    """
+
+    def __init__(self):
+        self.__file = None
+        self.__levels = []
+
+    def scale(self, file_name: str, width: int, height: int) -> GdkPixbuf.Pixbuf:
+        """
+        Returns the image scaled to the given size.
+
+        :param file_name: image file path
+        :param width: target width
+        :param height: target height
+        :return: scaled image
+        """
+        if file_name != self.__file:
+            self.__levels = [GdkPixbuf.Pixbuf.new_from_file(file_name)]
+            self.__file = file_name
+        return self.get_level(width, height).scale_simple(width, height, GdkPixbuf.InterpType.BILINEAR)
+
+    def get_level(self, width: int, height: int) -> GdkPixbuf.Pixbuf:
+        """
+        Returns the smallest mip level covering the given size, creating it if required.
+
+        :param width: target width
+        :param height: target height
+        :return: mip level
+        """
+        level = self.__levels[-1]
+        while level.get_width() // 2 >= width and level.get_height() // 2 >= height:
+            level = level.scale_simple(level.get_width() // 2, level.get_height() // 2,
+                                       GdkPixbuf.InterpType.BILINEAR)
+            self.__levels.append(level)
+        for level in reversed(self.__levels):
+            if level.get_width() >= width and level.get_height() >= height:
+                return level
+        return self.__levels[0]
@@ -0,0 +1,89 @@
+"""
+Caches the responses of the weather endpoints on disk.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Optional, Tuple
+
+from halo.settings import DEFAULT_CACHE_LOCATION
+
+
+class ResponseCache:
+    """sqlite3 database class that stores api responses keyed by endpoint slug, query and units."""
+
+    def __init__(self, db_location: str = DEFAULT_CACHE_LOCATION):
+        """
+        Initialises the connection and creates the cache table.
+
+        :param db_location: File location of database.
+        """
+        self.__lock = threading.Lock()
+        self.__conn = sqlite3.connect(db_location, check_same_thread=False)
+        with self.__lock:
+            self.__conn.execute('''CREATE TABLE IF NOT EXISTS response(slug text, query text, units text,
+            fetched real, body text, PRIMARY KEY(slug, query, units))''')
+            self.__conn.commit()
+
+    def get(self, slug: str, query: str, units: str) -> Optional[Tuple[Any, float]]:
+        """
+        Retrieves a cached response.
+
+        :param slug: endpoint slug
+        :param query: search query
+        :param units: system of units
+        :return: a tuple of the response and its age in seconds or None if not cached.
+        """
+        cached = self.get_raw(slug, query, units)
+        if cached is None:
+            return None
+        return json.loads(cached[0]), cached[1]
+
+    def get_raw(self, slug: str, query: str, units: str) -> Optional[Tuple[str, float]]:
+        """
+        Retrieves the json text of a cached response.
+
+        :param slug: endpoint slug
+        :param query: search query
+        :param units: system of units
+        :return: a tuple of the json text and its age in seconds or None if not cached.
+        """
+        with self.__lock:
+            row = self.__conn.execute('''SELECT fetched, body FROM response WHERE slug=? AND query=? AND units=?''',
+                                      (slug, query, units)).fetchone()
+        if row is None:
+            return None
+        return row[1], time.time() - row[0]
+
+    def put(self, slug: str, query: str, units: str, data: Any):
+        """
+        Stores a response.
+
+        :param slug: endpoint slug
+        :param query: search query
+        :param units: system of units
+        :param data: decoded response
+        """
+        self.put_raw(slug, query, units, json.dumps(data))
+
+    def put_raw(self, slug: str, query: str, units: str, body: str):
+        """
+        Stores the json text of a response.
+
+        :param slug: endpoint slug
+        :param query: search query
+        :param units: system of units
+        :param body: json text
+        """
+        with self.__lock:
+            self.__conn.execute('''INSERT OR REPLACE INTO response VALUES (?,?,?,?,?)''',
+                                (slug, query, units, time.time(), body))
+            self.__conn.commit()
+
+    def clear(self):
+        """Removes every cached response."""
+        with self.__lock:
+            self.__conn.execute('''DELETE FROM response''')
+            self.__conn.commit()
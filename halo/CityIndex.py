@@ -0,0 +1,251 @@
+"""
+An offline index of cities, searched by name while typing.
+"""
+
+import gzip
+import shutil
+import threading
+import unicodedata
+from collections import namedtuple
+from os import path
+from typing import Iterable, List, Set, Tuple
+
+from halo.DataStore import connect, Writer
+from halo.settings import DEFAULT_CITY_INDEX_LOCATION, BUNDLED_CITY_INDEX, STREAM_CHUNK_SIZE
+from halo.Stream import iter_array
+
+City = namedtuple('City', ['name', 'country', 'lat', 'lon', 'id'])
+
+
+def normalize(text: str) -> str:
+    """
+    Returns the search key of a name: lower case, without accents and extra spaces.
+
+    :param text: name
+    :return: key
+    """
+    text = unicodedata.normalize('NFKD', text)
+    return " ".join("".join(c for c in text if not unicodedata.combining(c)).lower().split())
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Returns the Levenshtein distance of two strings."""
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def trigrams(key: str) -> Set[str]:
+    """
+    Returns the trigrams of the start of a search key, the first one marking the beginning of the name.
+
+    :param key: normalized name
+    :return: trigrams
+    """
+    key = " " + key[:CityIndex.GRAM_PREFIX]
+    return {key[i:i + 3] for i in range(len(key) - 2)}
+
+
+class CityIndex:
+    """
+    sqlite3 database class of cities with their coordinates and provider id.
+
+    Cities are clustered on their normalized name, so the cities starting with
+    what has been typed are one contiguous range of the table. Names with a typo
+    are found through the trigrams of their start, kept in a table of their own. The index is
+    filled by :func:`build` from the city list of the provider, or grows with
+    every city the app comes across.
+
+    Like :class:`DataStore` there is only one index per database file in the process.
+    """
+    GRAM_PREFIX = 8
+    """ number of leading characters of a name whose trigrams are indexed."""
+    FUZZY_CANDIDATES = 32
+    """ maximum names sharing the most trigrams compared when nothing starts with the text typed."""
+
+    __instances = {}
+    __instances_lock = threading.Lock()
+
+    def __new__(cls, db_location: str = DEFAULT_CITY_INDEX_LOCATION):
+        """
+        Returns the index of the database, initialising it on first use.
+
+        :param db_location: File location of database.
+        """
+        with CityIndex.__instances_lock:
+            index = CityIndex.__instances.get(db_location)
+            if index is None:
+                index = super().__new__(cls)
+                index.__setup(db_location)
+                CityIndex.__instances[db_location] = index
+            return index
+
+    def __setup(self, db_location: str):
+        if not path.exists(db_location) and path.isfile(BUNDLED_CITY_INDEX):
+            shutil.copyfile(BUNDLED_CITY_INDEX, db_location)
+        self.__db_location = db_location
+        self.__lock = threading.Lock()
+        self.__conn = connect(db_location)
+        self.__conn.execute('''CREATE TABLE IF NOT EXISTS city(key text, country text, id integer, name text,
+        lat real, lon real, PRIMARY KEY(key, country, id)) WITHOUT ROWID''')
+        self.__conn.execute('''CREATE TABLE IF NOT EXISTS gram(gram text, key text, country text, id integer,
+        PRIMARY KEY(gram, key, country, id)) WITHOUT ROWID''')
+        if self.__conn.execute('''SELECT NOT EXISTS(SELECT 1 FROM gram) AND EXISTS(SELECT 1 FROM city)''') \
+                .fetchone()[0]:
+            # An index made before the trigrams were kept.
+            self.__conn.executemany('''INSERT OR IGNORE INTO gram VALUES (?,?,?,?)''',
+                                    [row for city in self.__conn.execute('''SELECT key, country, id FROM city''')
+                                     for row in CityIndex.__grams(*city)])
+        self.__conn.commit()
+        self.__writer = Writer(db_location)
+
+    def close(self):
+        """Writes out the pending writes and closes the connection. The next `CityIndex()` call opens a new one."""
+        with CityIndex.__instances_lock:
+            CityIndex.__instances.pop(self.__db_location, None)
+        self.__writer.close()
+        with self.__lock:
+            self.__conn.close()
+
+    def add(self, name: str, country: str, lat: float = None, lon: float = None, city_id: int = None):
+        """
+        Adds a city unless it's known or has no id. It's written to db in background.
+
+        :param name: city name
+        :param country: country code
+        :param lat: latitude
+        :param lon: longitude
+        :param city_id: id of city used by the provider.
+        """
+        if city_id is None:
+            return
+        key, country = normalize(name), country.upper()
+        self.__writer.submit(('city', key, country, city_id), '''INSERT OR IGNORE INTO city VALUES (?,?,?,?,?,?)''',
+                             (key, country, city_id, name, lat, lon))
+        grams = CityIndex.__grams(key, country, city_id)
+        if grams:
+            self.__writer.submit(('gram', key, country, city_id), '''INSERT OR IGNORE INTO gram VALUES '''
+                                 + ",".join(["(?,?,?,?)"] * len(grams)), sum(grams, ()))
+
+    def add_many(self, cities: Iterable[City]) -> int:
+        """
+        Adds many cities at once, replacing the ones known.
+
+        :param cities: cities
+        :return: number of cities added
+        """
+        rows = [(normalize(c.name), c.country.upper(), c.id, c.name, c.lat, c.lon) for c in cities]
+        with self.__lock:
+            self.__conn.executemany('''INSERT OR REPLACE INTO city VALUES (?,?,?,?,?,?)''', rows)
+            self.__conn.executemany('''INSERT OR IGNORE INTO gram VALUES (?,?,?,?)''',
+                                    [gram for row in rows for gram in CityIndex.__grams(*row[:3])])
+            self.__conn.commit()
+        return len(rows)
+
+    @staticmethod
+    def __grams(key: str, country: str, city_id: int) -> List[Tuple[str, str, str, int]]:
+        return [(gram, key, country, city_id) for gram in sorted(trigrams(key))]
+
+    def flush(self):
+        """Waits until every pending write is on disk."""
+        self.__writer.flush()
+
+    def search(self, text: str, limit: int = 8) -> List[City]:
+        """
+        Finds the cities whose name starts with the text, or failing that the ones
+        whose name starts with nearly the text, like with a typo. Both are a few
+        index lookups, whatever the size of the index.
+
+        :param text: name typed, optionally followed by a comma and a country code.
+        :param limit: maximum number of cities returned
+        :return: cities ordered by name
+        """
+        name, _, country = text.partition(',')
+        key = normalize(name)
+        country = country.strip().upper()
+        if not key:
+            return []
+        cities = self.__range(key, country, limit)
+        if cities or len(key) < 4:
+            return cities
+
+        # A typo changes at most 3 trigrams, so only the names sharing the most of them are compared.
+        # Typos are looked for after the first letter, which keeps every lookup to a narrow range.
+        tolerance = max(1, len(key) // 4)
+        grams = trigrams(key)
+        sql = '''SELECT name, country, lat, lon, id FROM city NATURAL JOIN
+        (SELECT key, country, id, COUNT(*) AS hits FROM gram WHERE gram IN ({}) AND key >= ? AND key < ?{}
+        GROUP BY key, country, id HAVING hits >= ? ORDER BY hits DESC LIMIT ?)'''.format(
+            ",".join("?" * len(grams)), " AND country LIKE ?" if country else "")
+        params = sorted(grams) + [key[0], key[0] + '\U0010ffff'] + ([country + '%'] if country else []) + \
+            [max(1, len(grams) - 3 * tolerance), CityIndex.FUZZY_CANDIDATES]
+        with self.__lock:
+            candidates = [City(*row) for row in self.__conn.execute(sql, params)]
+        scored = []
+        for city in candidates:
+            d = edit_distance(key, normalize(city.name)[:len(key)])
+            if d <= tolerance:
+                scored.append((d, normalize(city.name), city.country, city))
+        scored.sort(key=lambda item: item[:3])
+        return [item[-1] for item in scored[:limit]]
+
+    def __range(self, prefix: str, country: str, limit: int) -> List[City]:
+        # Every key starting with prefix sorts between prefix and prefix followed by the highest character.
+        sql = '''SELECT name, country, lat, lon, id FROM city WHERE key >= ? AND key < ?'''
+        params = [prefix, prefix + '\U0010ffff']  # type: List
+        if country:
+            sql += ''' AND country LIKE ?'''
+            params.append(country + '%')
+        sql += ''' ORDER BY key LIMIT ?'''
+        params.append(limit)
+        with self.__lock:
+            return [City(*row) for row in self.__conn.execute(sql, params)]
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return self.__conn.execute('''SELECT COUNT(*) FROM city''').fetchone()[0]
+
+
+def label(city: City) -> str:
+    """Returns the search query of a city, like London,GB."""
+    return "{},{}".format(city.name, city.country)
+
+
+def read_city_list(file_name: str) -> Iterable[City]:
+    """
+    Reads the city list of openweathermap.org (city.list.json, optionally gzipped)
+    without loading the whole document.
+
+    :param file_name: path of the list
+    :return: iterator of cities
+    """
+    opener = gzip.open if file_name.endswith('.gz') else open
+    with opener(file_name, 'rb') as f:
+        for item in iter_array(iter(lambda: f.read(STREAM_CHUNK_SIZE), b''), None):
+            coord = item.get('coord', {})
+            yield City(item['name'], item.get('country', ''), coord.get('lat'), coord.get('lon'), item['id'])
+
+
+def build(file_name: str, db_location: str = DEFAULT_CITY_INDEX_LOCATION) -> Tuple[int, int]:
+    """
+    Fills an index from the city list of openweathermap.org, which can be downloaded from
+    http://bulk.openweathermap.org/sample/city.list.json.gz
+
+    :param file_name: path of the list
+    :param db_location: File location of database.
+    :return: a tuple of the cities read and the size of the index.
+    """
+    index = CityIndex(db_location)
+    count = 0
+    batch = []
+    for city in read_city_list(file_name):
+        batch.append(city)
+        if len(batch) == 10000:
+            count += index.add_many(batch)
+            batch = []
+    count += index.add_many(batch)
+    return count, len(index)
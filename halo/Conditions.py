@@ -0,0 +1,105 @@
+"""
+Maps the weather condition codes of providers to icons and display metadata.
+
+Codes follow the condition codes of openweathermap.org. Each provider
+registers how its own icon codes translate to them, and the lookup tables
+are built once at import so every lookup is a single dict access.
+"""
+
+from collections import namedtuple
+from typing import Dict, Optional, Tuple
+
+Condition = namedtuple('Condition', ['code', 'icon', 'label', 'day'])
+""" A weather condition: code, icon asset name, display label and whether it's day time."""
+
+DEFAULT_ICON = "wi-cloudy"
+DEFAULT_LABEL = "Clouds"
+
+# Ranges of codes in order of precedence: first code, last code, icon, label.
+_CODE_RANGES = (
+    (200, 233, "wi-thunderstorm", "Thunderstorm"),
+    (300, 302, "wi-rain-mix", "Drizzle"),
+    (500, 522, "wi-rain", "Rain"),
+    (900, 900, "wi-rain", "Rain"),
+    (600, 623, "wi-snow", "Snow"),
+    (711, 711, "wi-smoke", "Smoke"),
+    (731, 731, "wi-dust", "Dust"),
+    (700, 751, "wi-fog", "Fog"),
+    (800, 800, "wi-day-sunny", "Clear"),
+    (801, 803, "wi-day-cloudy", "Clouds"),
+)
+
+
+def _build_code_table() -> Dict[int, Tuple[str, str]]:
+    table = {}
+    for first, last, icon, label in _CODE_RANGES:
+        for code in range(first, last + 1):
+            table.setdefault(code, (icon, label))
+    return table
+
+
+CODE_TABLE = _build_code_table()
+""" condition code -> (icon, label)"""
+
+ICON_NAMES = tuple(sorted({icon for icon, _ in CODE_TABLE.values()} | {DEFAULT_ICON}))
+""" every icon asset in use."""
+
+PROVIDER_TABLES = {}  # type: Dict[str, Dict[str, Condition]]
+""" provider name -> provider icon code -> condition"""
+
+
+def get_icon_name(code: int) -> str:
+    """
+    Returns the icon asset name of a condition code.
+
+    :param code: condition code
+    :return: icon name
+    """
+    return CODE_TABLE.get(int(code), (DEFAULT_ICON, DEFAULT_LABEL))[0]
+
+
+def get_label(code: int) -> str:
+    """
+    Returns the display label of a condition code.
+
+    :param code: condition code
+    :return: label
+    """
+    return CODE_TABLE.get(int(code), (DEFAULT_ICON, DEFAULT_LABEL))[1]
+
+
+def register_provider(provider: str, codes: Dict[str, Tuple[int, bool]]):
+    """
+    Registers how the icon codes of a provider map to condition codes.
+
+    :param provider: provider name
+    :param codes: a dict mapping provider icon code to a tuple of condition code and whether it's day time.
+    """
+    PROVIDER_TABLES[provider] = {icon: Condition(code, get_icon_name(code), get_label(code), day)
+                                 for icon, (code, day) in codes.items()}
+
+
+def get_condition(provider: str, icon: str) -> Optional[Condition]:
+    """
+    Returns the condition of a provider icon code.
+
+    :param provider: provider name
+    :param icon: icon code used by provider
+    :return: condition or None if unknown.
+    """
+    return PROVIDER_TABLES.get(provider, {}).get(icon)
+
+
+def _day_night(codes: Dict[str, int]) -> Dict[str, Tuple[int, bool]]:
+    """Expands icon codes to their day ('d') and night ('n') variants."""
+    table = {}
+    for icon, code in codes.items():
+        table[icon + 'd'] = (code, True)
+        table[icon + 'n'] = (code, False)
+    return table
+
+
+register_provider('openweathermap', _day_night({
+    '11': 201, '01': 800, '02': 801, '03': 804, '04': 804,
+    '09': 300, '10': 500, '13': 600, '50': 731,
+}))
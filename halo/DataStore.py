@@ -2,63 +2,204 @@
 Handles the data storage and retrieval.
 """
 
+import json
 import sqlite3
+import threading
 import time
+from collections import OrderedDict
 from functools import wraps
 from os import path
-from typing import Tuple
+from typing import Any, Dict, Hashable, Optional, Tuple
 
 from halo.settings import DEFAULT_DB_LOCATION, DEFAULT_WEATHER_API_KEY, \
-    DEFAULT_BACKGROUND_IMAGE, DEFAULT_SCREEN_HEIGHT, DEFAULT_SCREEN_WIDTH, DEFAULT_UNITS, SUPPORTED_UNITS
+    DEFAULT_BACKGROUND_IMAGE, DEFAULT_SCREEN_HEIGHT, DEFAULT_SCREEN_WIDTH, DEFAULT_UNITS, SUPPORTED_UNITS, \
+    DB_BUSY_TIMEOUT, DB_RETRIES, DB_RETRY_DELAY, DEFAULT_PROVIDER
 
 
 def query(fn):
-    """A decorator which ensures if a database lock ever happen, then sqlite query is retired seamlessly."""
+    """
+    A decorator which ensures if a database lock ever happen, then sqlite query is retried
+    a few times with exponential backoff before giving up.
+    """
     @wraps(fn)
     def wrap(*args, **kwargs):
-        while True:
+        delay = DB_RETRY_DELAY
+        for attempt in range(DB_RETRIES + 1):
             try:
-                fn(*args, **kwargs)
-                break
+                return fn(*args, **kwargs)
             except sqlite3.OperationalError as e:
-                if "locked" in str(e):
-                    time.sleep(1)
-                    print("DB is in locked state. Retrying...")
-                else:
+                if "locked" not in str(e) or attempt == DB_RETRIES:
                     raise
+                time.sleep(delay)
+                delay *= 2
     return wrap
 
 
+def connect(db_location: str) -> sqlite3.Connection:
+    """
+    Opens a connection in WAL mode, so readers are never blocked by the writer.
+
+    :param db_location: File location of database.
+    :return: connection
+    """
+    conn = sqlite3.connect(db_location, timeout=DB_BUSY_TIMEOUT, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    return conn
+
+
+class Writer(threading.Thread):
+    """
+    Applies the writes of a database on a background thread using its own connection.
+
+    Writes are queued under a key and a later write with the same key replaces
+    the pending one, so bursts like the screen size updates of a window
+    resize end up as a single statement.
+    """
+
+    def __init__(self, db_location: str):
+        """
+        :param db_location: File location of database.
+        """
+        super().__init__(name="halo-db-writer", daemon=True)
+        self.__db_location = db_location
+        self.__pending = OrderedDict()
+        self.__applying = []
+        self.__busy = False
+        self.__closed = False
+        self.__cond = threading.Condition()
+        self.start()
+
+    def submit(self, key: Hashable, sql: str, params: Tuple[Any, ...]):
+        """
+        Queues a write without waiting for it.
+
+        :param key: writes with the same key are coalesced.
+        :param sql: statement
+        :param params: parameters of statement
+        """
+        with self.__cond:
+            self.__pending.pop(key, None)
+            self.__pending[key] = (sql, params)
+            self.__cond.notify_all()
+
+    def pending(self, kind: str) -> list:
+        """
+        Returns the parameters of the writes not yet on disk whose key starts with `kind`,
+        so readers can see them without waiting, oldest first.
+
+        :param kind: first element of the keys
+        :return: list of parameters
+        """
+        with self.__cond:
+            return [params for key, (sql, params) in self.__applying + list(self.__pending.items())
+                    if isinstance(key, tuple) and key[0] == kind]
+
+    def flush(self):
+        """Waits until every queued write is on disk."""
+        with self.__cond:
+            self.__cond.wait_for(lambda: not self.__pending and not self.__busy)
+
+    def close(self):
+        """Writes out the queue and stops the thread."""
+        with self.__cond:
+            self.__closed = True
+            self.__cond.notify_all()
+        self.join()
+
+    def run(self):
+        conn = connect(self.__db_location)
+        while True:
+            with self.__cond:
+                self.__cond.wait_for(lambda: self.__pending or self.__closed)
+                if not self.__pending:
+                    break
+                self.__applying = list(self.__pending.items())
+                self.__pending.clear()
+                self.__busy = True
+            try:
+                self.__apply(conn, [write for _, write in self.__applying])
+            except sqlite3.Error as e:
+                print("Unable to write to the database: {}".format(e))
+            finally:
+                with self.__cond:
+                    self.__applying = []
+                    self.__busy = False
+                    self.__cond.notify_all()
+        conn.close()
+
+    @staticmethod
+    @query
+    def __apply(conn: sqlite3.Connection, batch: list):
+        with conn:
+            for sql, params in batch:
+                conn.execute(sql, params)
+
+
 class DataStore:
-    """sqlite3 database class that store user data and app settings."""
+    """
+    sqlite3 database class that store user data and app settings.
+
+    There is only one store per database file in the process. Every
+    `DataStore()` call returns it, so the connection is opened, the schema
+    created and the settings read only once. Settings are kept in memory
+    and re-read from disk only when :meth:`invalidate` is called.
+    """
     __SCREEN_HEIGHT = DEFAULT_SCREEN_HEIGHT
     __SCREEN_WIDTH = DEFAULT_SCREEN_WIDTH
     __API_KEY = DEFAULT_WEATHER_API_KEY
     __BG_FILE = DEFAULT_BACKGROUND_IMAGE
     __UNITS = DEFAULT_UNITS
 
-    def __init__(self, db_location: str = DEFAULT_DB_LOCATION):
+    __instances = {}
+    __instances_lock = threading.Lock()
+
+    def __new__(cls, db_location: str = DEFAULT_DB_LOCATION):
+        """
+        Returns the store of the database, initialising it on first use.
+
+        :param db_location: File location of database.
+        """
+        with DataStore.__instances_lock:
+            store = DataStore.__instances.get(db_location)
+            if store is None:
+                store = super().__new__(cls)
+                store.__setup(db_location)
+                DataStore.__instances[db_location] = store
+            return store
+
+    def __setup(self, db_location: str):
         """
         Initialises the connection and create a cursor.
 
         :param db_location: File location of database.
         """
         self.__DB_LOCATION = db_location
-        self.__conn = sqlite3.connect(self.__DB_LOCATION)
+        self.__lock = threading.RLock()
+        self.__conn = connect(self.__DB_LOCATION)
         if self.__conn is None:
             raise sqlite3.DatabaseError("Could not get a database connection")
         self.__cur = self.__conn.cursor()
+        self.__settings = {}
+        self.__observed = {}
         self._first_run()
-        self.refresh_preference()
+        self.__writer = Writer(self.__DB_LOCATION)
+        self.invalidate()
 
-    def __del__(self):
-        self.__conn.close()
+    def close(self):
+        """Writes out the pending writes and closes the connection. The next `DataStore()` call opens a new one."""
+        with DataStore.__instances_lock:
+            DataStore.__instances.pop(self.__DB_LOCATION, None)
+        self.__writer.close()
+        with self.__lock:
+            self.__conn.close()
 
     @query
     def _first_run(self):
         """Initially create the tables and row contents."""
         self.__cur.execute('''CREATE TABLE IF NOT EXISTS city(city_name text, 
         country_code text, UNIQUE(city_name, country_code) ON CONFLICT REPLACE)''')
+        if 'city_id' not in [column[1] for column in self.__cur.execute('PRAGMA table_info(city)')]:
+            self.__cur.execute('''ALTER TABLE city ADD COLUMN city_id integer''')
         self.__cur.execute('''CREATE TABLE IF NOT EXISTS setting(name text, 
                 value text, UNIQUE(name))''')
         self.__cur.execute('''INSERT or IGNORE INTO setting VALUES('api-key',?)''',
@@ -71,10 +212,20 @@ class DataStore:
                            (DEFAULT_SCREEN_HEIGHT,))
         self.__cur.execute('''INSERT or IGNORE INTO setting VALUES('units',?)''',
                            (DEFAULT_UNITS,))
+        self.__cur.execute('''INSERT or IGNORE INTO setting VALUES('last-weather','')''')
+        self.__cur.execute('''INSERT or IGNORE INTO setting VALUES('request-usage','')''')
+        self.__cur.execute('''INSERT or IGNORE INTO setting VALUES('provider',?)''', (DEFAULT_PROVIDER,))
         self.__conn.commit()
 
+    def invalidate(self):
+        """Re-reads every preference value from db, discarding the ones held in memory."""
+        self.flush()  # Or a queued write would bring an old value back.
+        with self.__lock:
+            self.__settings = dict(self.__cur.execute('''SELECT name, value FROM setting'''))
+        self.refresh_preference()
+
     def refresh_preference(self):
-        """Loads latest preference values from db"""
+        """Publishes the latest preference values held in memory."""
         DataStore.__API_KEY = self.__fetch_settings('api-key')
 
         bg = self.__fetch_settings('bg-image')
@@ -86,24 +237,42 @@ class DataStore:
 
     def __fetch_settings(self, name: str) -> str:
         """
-        Fetches the specified settings from database.
+        Fetches the specified settings held in memory.
 
         :param name: Name of preference to be fetched.
         :return: Returns the value of the preference.
         """
-        return self.__cur.execute('''SELECT value FROM setting WHERE "name"=?''',
-                                  (name,)).fetchone()[0]
+        return self.__settings[name]
 
-    @query
     def __update_settings(self, name: str, value: str):
         """
-        Updates specific preference value.
+        Updates specific preference value. It's written to db in background.
 
         :param name: name of preference to be updated.
         :param value: value of preference.
         """
-        self.__cur.execute('''UPDATE setting SET "value"=? WHERE "name"=?''', (value, name))
-        self.__conn.commit()
+        if self.__settings.get(name) == value:
+            return  # Like the weather shown again from cache.
+        self.__settings[name] = value
+        self.__writer.submit(('setting', name), '''UPDATE setting SET "value"=? WHERE "name"=?''', (value, name))
+
+    def flush(self):
+        """Waits until every pending write is on disk."""
+        self.__writer.flush()
+
+    def __get_city_rows(self) -> Dict[Tuple[str, str], Optional[int]]:
+        """
+        Reads the cities with their id, including the ones still queued, without waiting for the writer.
+
+        :return: an ordered dict mapping (city, country code) to its id or None.
+        """
+        queued = self.__writer.pending('city')  # Before reading, so a write can't be missed in between.
+        with self.__lock:
+            rows = OrderedDict(((name, country), city_id) for name, country, city_id in
+                               self.__cur.execute('''SELECT city_name, country_code, city_id FROM city'''))
+        for name, country, city_id in queued:
+            rows[(name, country)] = city_id
+        return rows
 
     def get_cities(self) -> list:
         """
@@ -111,17 +280,40 @@ class DataStore:
 
         :return: list of city name and country codes.
         """
-        return list(self.__cur.execute('''SELECT * FROM city'''))
+        return list(self.__get_city_rows())
 
-    @query
-    def add_city(self, params: Tuple[str, str]):
+    def get_city_ids(self) -> Dict[str, int]:
+        """
+        Get the provider ids of the cities whose id is known.
+
+        :return: a dict mapping "city,COUNTRY" to its id.
         """
-        Adds the city to db if it doesn't exists.
+        return {"{},{}".format(name, str(country).upper()): city_id
+                for (name, country), city_id in self.__get_city_rows().items() if city_id is not None}
+
+    def add_city(self, params: Tuple[str, str], city_id: int = None):
+        """
+        Adds the city to db if it doesn't exists. It's written to db in background.
 
         :param params: a tuple of city and country code
+        :param city_id: id of city used by the provider.
         """
-        self.__cur.execute('''INSERT INTO city VALUES (?,?)''', params)
-        self.__conn.commit()
+        self.__writer.submit(('city',) + tuple(params), '''INSERT INTO city VALUES (?,?,?)''',
+                             tuple(params) + (city_id,))
+
+    def observe(self, city: str, observed_at: int) -> bool:
+        """
+        Remembers the time of the last observation seen for a city.
+
+        :param city: name of city.
+        :param observed_at: time of the observation.
+        :return: True when it's new, False when it was already seen like when it comes from cache.
+        """
+        with self.__lock:
+            if self.__observed.get(city) == observed_at:
+                return False
+            self.__observed[city] = observed_at
+            return True
 
     @staticmethod
     def get_api_key() -> str:
@@ -173,6 +365,62 @@ class DataStore:
         else:
             print("The unit provided is not supported.")
 
+    def get_last_weather(self) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Retrieves the current weather shown last time.
+
+        :return: a tuple containing city, city timezone, current weather data or None.
+        """
+        last = self.__fetch_settings('last-weather')
+        return tuple(json.loads(last)) if last else None
+
+    def set_last_weather(self, city: str, city_tz: str, weather: Dict[str, Any]):
+        """
+        Remembers the current weather shown, so that it can be displayed right at next start.
+
+        :param city: city
+        :param city_tz: city timezone
+        :param weather: current weather data
+        """
+        self.__update_settings('last-weather', json.dumps([city, city_tz, weather]))
+
+    def get_provider(self) -> str:
+        """
+        Retrieves the name of the weather provider chosen.
+
+        :return: provider name
+        """
+        return self.__fetch_settings('provider')
+
+    def set_provider(self, name: str):
+        """
+        Chooses the weather provider used from next start.
+
+        :param name: name of a registered provider
+        """
+        self.__update_settings('provider', name)
+
+    def get_request_usage(self) -> Tuple[str, int]:
+        """
+        Retrieves the number of api requests sent on a day.
+
+        :return: a tuple of the day as YYYY-MM-DD and the count or ('', 0) if nothing is recorded.
+        """
+        usage = self.__fetch_settings('request-usage')
+        if not usage:
+            return '', 0
+        day, count = usage.split(':')
+        return day, int(count)
+
+    def set_request_usage(self, day: str, count: int):
+        """
+        Records the number of api requests sent on a day. It's written to db in background.
+
+        :param day: day as YYYY-MM-DD
+        :param count: number of requests
+        """
+        self.__update_settings('request-usage', "{}:{}".format(day, count))
+
     def screen(self, width: int, height: int):
         """
         Save the screen width and height to the db.
@@ -180,11 +428,8 @@ class DataStore:
         :param width: Width of screen.
         :param height: Height of screen.
         """
-        try:
-            self.__update_settings('screen-width', str(max(width, DEFAULT_SCREEN_WIDTH)))
-            self.__update_settings('screen-height', str(max(height, DEFAULT_SCREEN_HEIGHT)))
-        except sqlite3.OperationalError:
-            pass
+        self.__update_settings('screen-width', str(max(width, DEFAULT_SCREEN_WIDTH)))
+        self.__update_settings('screen-height', str(max(height, DEFAULT_SCREEN_HEIGHT)))
 
     @staticmethod
     def get_width() -> int:
@@ -0,0 +1,148 @@
+"""
+Keeps every observed weather data point, so trends don't depend on the paid history endpoint.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+from halo.DataStore import Writer, connect
+from halo.Series import Observation, WeatherSeries
+from halo.settings import DEFAULT_HISTORY_LOCATION, HISTORY_RAW_DAYS, HISTORY_RETENTION_DAYS
+
+
+class HistoryStore:
+    """
+    sqlite3 database class that stores observations per city.
+
+    Observations are only ever appended, into a table clustered on
+    (city, timestamp), so a range query of a city reads one contiguous run
+    of rows. Raw observations older than HISTORY_RAW_DAYS are averaged into
+    hourly points and points older than HISTORY_RETENTION_DAYS are dropped.
+
+    Like :class:`DataStore` there is only one store per database file in the process.
+    """
+    RAW = 0
+    HOURLY = 3600
+
+    __instances = {}
+    __instances_lock = threading.Lock()
+
+    def __new__(cls, db_location: str = DEFAULT_HISTORY_LOCATION):
+        """
+        Returns the store of the database, initialising it on first use.
+
+        :param db_location: File location of database.
+        """
+        with HistoryStore.__instances_lock:
+            store = HistoryStore.__instances.get(db_location)
+            if store is None:
+                store = super().__new__(cls)
+                store.__setup(db_location)
+                HistoryStore.__instances[db_location] = store
+            return store
+
+    def __setup(self, db_location: str):
+        self.__db_location = db_location
+        self.__lock = threading.Lock()
+        self.__conn = connect(db_location)
+        self.__conn.execute('''CREATE TABLE IF NOT EXISTS observation(city text, ts integer, temp real,
+        humidity real, pressure real, wind real, code integer, day integer, resolution integer,
+        samples integer DEFAULT 1, PRIMARY KEY(city, ts)) WITHOUT ROWID''')
+        if 'samples' not in [column[1] for column in self.__conn.execute('PRAGMA table_info(observation)')]:
+            self.__conn.execute('''ALTER TABLE observation ADD COLUMN samples integer DEFAULT 1''')
+        self.__conn.commit()
+        self.__writer = Writer(db_location)
+        self.compact()
+
+    def close(self):
+        """Writes out the pending writes and closes the connection. The next `HistoryStore()` call opens a new one."""
+        with HistoryStore.__instances_lock:
+            HistoryStore.__instances.pop(self.__db_location, None)
+        self.__writer.close()
+        with self.__lock:
+            self.__conn.close()
+
+    def record(self, city: str, observation: Observation):
+        """
+        Appends an observation. It's written to db in background.
+
+        :param city: city
+        :param observation: observed weather
+        """
+        self.__writer.submit(('observation', city, observation.dt),
+                             '''INSERT OR IGNORE INTO observation VALUES (?,?,?,?,?,?,?,?,?,1)''',
+                             (city,) + tuple(observation[:-1]) + (int(observation.day), HistoryStore.RAW))
+
+    def compact(self, now: float = None):
+        """
+        Downsamples old raw observations to hourly points and drops expired ones. It's done in background.
+
+        Observations of an hour compacted earlier are averaged with its point, weighted by the
+        number of observations each stands for.
+
+        :param now: current unix time
+        """
+        now = time.time() if now is None else now
+        raw_before = int(now - HISTORY_RAW_DAYS * 86400)
+        # A raw observation right on the hour is one of those averaged, so it doesn't count again.
+        weight = "(CASE WHEN resolution = {} THEN 0 ELSE samples END)".format(HistoryStore.RAW)
+        merged = ", ".join("{0} = ({0} * {1} + excluded.{0} * excluded.samples) / ({1} + excluded.samples)"
+                           .format(column, weight) for column in ('temp', 'humidity', 'pressure', 'wind'))
+        self.__writer.submit('downsample', '''INSERT INTO observation
+        SELECT city, ts - ts % 3600, AVG(temp), AVG(humidity), AVG(pressure), AVG(wind), MAX(code), MAX(day), ?,
+        COUNT(*) FROM observation WHERE resolution = ? AND ts < ? GROUP BY city, ts - ts % 3600
+        ON CONFLICT(city, ts) DO UPDATE SET ''' + merged + ''', code = MAX(code, excluded.code),
+        day = MAX(day, excluded.day), samples = ''' + weight + ''' + excluded.samples,
+        resolution = excluded.resolution''',
+                             (HistoryStore.HOURLY, HistoryStore.RAW, raw_before))
+        self.__writer.submit('drop-raw', '''DELETE FROM observation WHERE resolution = ? AND ts < ?''',
+                             (HistoryStore.RAW, raw_before))
+        self.__writer.submit('retention', '''DELETE FROM observation WHERE ts < ?''',
+                             (int(now - HISTORY_RETENTION_DAYS * 86400),))
+
+    def flush(self):
+        """Waits until every pending write is on disk."""
+        self.__writer.flush()
+
+    def get_range(self, city: str, start: float, end: float) -> WeatherSeries:
+        """
+        Returns the observations of a city in a time range.
+
+        :param city: city
+        :param start: unix time from which observations are included.
+        :param end: unix time before which observations are included.
+        :return: series ordered by time.
+        """
+        series = WeatherSeries()
+        with self.__lock:
+            for row in self.__conn.execute('''SELECT ts, temp, humidity, pressure, wind, code, day
+            FROM observation WHERE city = ? AND ts >= ? AND ts < ? ORDER BY ts''', (city, int(start), int(end))):
+                series.append(*row)
+        return series
+
+    def get_yesterday(self, city: str, tz: str) -> WeatherSeries:
+        """
+        Returns the observations of a city during the previous day in its timezone.
+
+        :param city: city
+        :param tz: city timezone
+        :return: series ordered by time.
+        """
+        zone = pytz.timezone(tz)
+        midnight = datetime.now(zone).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+        return self.get_range(city, zone.localize(midnight - timedelta(days=1)).timestamp(),
+                              zone.localize(midnight).timestamp())
+
+    def get_last(self, city: str, seconds: float) -> WeatherSeries:
+        """
+        Returns the observations of a city during the last given seconds, like a week.
+
+        :param city: city
+        :param seconds: length of range
+        :return: series ordered by time.
+        """
+        now = time.time()
+        return self.get_range(city, now - seconds, now + 1)
@@ -1,20 +1,31 @@
+import threading
+from collections import OrderedDict
+
 import gi
 
-from halo.settings import BASE
+from halo.Conditions import ICON_NAMES, get_icon_name
+from halo.settings import BASE, ICON_CACHE_SIZE
 
 gi.require_version("GdkPixbuf", "2.0")
-from gi.repository import GdkPixbuf  # noqa: E402
+gi.require_version("Gtk", "3.0")
+from gi.repository import GdkPixbuf, Gdk, Gtk  # noqa: E402
 
 
 class Icon:
     """
     It is for choosing and retuning Weather icons.
+
+    Rendered icons are kept in a LRU cache keyed by name, size and scale
+    factor, so redraws never have to parse the svg files again.
     """
+    __cache = OrderedDict()
+    __cache_lock = threading.Lock()
+
     def __init__(self):
         pass
 
     @staticmethod
-    def get_icon(status: str, size: int = 50) -> GdkPixbuf.Pixbuf:
+    def get_icon(status: str, size: int = 50, scale: int = 1) -> GdkPixbuf.Pixbuf:
         """
         Return Weather icons as per status.
 
@@ -30,28 +41,55 @@ class Icon:
          Partial Cloudy: 801 - 803,
          Cloudy: 804
         """
-        status = int(status)
-        if 200 <= status <= 233:
-            name = "wi-thunderstorm"
-        elif 300 <= status <= 302:
-            name = "wi-rain-mix"
-        elif 500 <= status <= 522 or status == 900:
-            name = "wi-rain"
-        elif 600 <= status <= 623:
-            name = "wi-snow"
-        elif status == 711:
-            name = "wi-smoke"
-        elif status == 731:
-            name = "wi-dust"
-        elif 700 <= status <= 751:
-            name = "wi-fog"
-        elif status == 800:
-            name = "wi-day-sunny"
-        elif 801 <= status <= 803:
-            name = "wi-day-cloudy"
-        else:
-            name = "wi-cloudy"
-
-        return GdkPixbuf.Pixbuf.new_from_file_at_scale(
+        return Icon.load(get_icon_name(status), size, scale)
+
+    @staticmethod
+    def show(image: Gtk.Image, status: str, size: int = 50):
+        """
+        Shows the icon of a status in an image, rendered for the scale factor of its
+        display so that it stays sharp on HiDPI screens.
+
+        :param image: image widget
+        :param status: weather condition code
+        :param size: size in logical pixels.
+        """
+        scale = image.get_scale_factor()
+        image.set_from_surface(Gdk.cairo_surface_create_from_pixbuf(Icon.get_icon(status, size, scale), scale, None))
+
+    @staticmethod
+    def load(name: str, size: int, scale: int = 1) -> GdkPixbuf.Pixbuf:
+        """
+        Return the named icon rendered at the given size, from cache when possible.
+
+        :param name: icon file name without extension.
+        :param size: size in logical pixels.
+        :param scale: scale factor of the widget showing the icon.
+        """
+        key = (name, size, scale)
+        with Icon.__cache_lock:
+            buff = Icon.__cache.get(key)
+            if buff is not None:
+                Icon.__cache.move_to_end(key)
+                return buff
+
+        buff = GdkPixbuf.Pixbuf.new_from_file_at_scale(
             BASE + "/assets/icon/{}.svg".format(name),
-            size, size, True)
+            size * scale, size * scale, True)
+
+        with Icon.__cache_lock:
+            Icon.__cache[key] = buff
+            while len(Icon.__cache) > ICON_CACHE_SIZE:
+                Icon.__cache.popitem(last=False)
+        return buff
+
+    @staticmethod
+    def prewarm(sizes: tuple = (50, 60), scale: int = 1):
+        """
+        Renders every icon ahead of time.
+
+        :param sizes: sizes in logical pixels.
+        :param scale: scale factor of the window.
+        """
+        for name in ICON_NAMES:
+            for size in sizes:
+                Icon.load(name, size, scale)
@@ -1,18 +1,25 @@
 import gi
 
+from halo.API import APIError
+from halo.AsyncAPI import AsyncAPI, EventLoop
+from halo.CityIndex import CityIndex, label
 from halo.DataStore import DataStore
+from halo.settings import DISPLAY_TEMP_UNITS, CITY_SEARCH_DELAY
 
 gi.require_version("Gtk", "3.0")
-from gi.repository import Gtk  # noqa: E402
+from gi.repository import Gtk, GLib  # noqa: E402
 
 
 class PlaceDialog(Gtk.Dialog):
     """
     Display the change city dialogue.
     """
-    def __init__(self, parent):
+    def __init__(self, parent, api: AsyncAPI = None):
         """
         Initialises the change city dialogue.
+
+        :param parent: parent
+        :param api: When given, the current temperature of every city is shown.
         """
         super().__init__(title="Enter your City", transient_for=parent, modal=True)
         self.add_button(Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL)
@@ -20,24 +27,43 @@ class PlaceDialog(Gtk.Dialog):
 
         self.box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
         self.place = Gtk.Entry()
+        self.suggestions = Gtk.ListStore(str, int)
+        self.found = {}
+        self.search_source = None
+        self.pending = set()
+        self.destroyed = False
+        self.loop = api.loop if api is not None else EventLoop.get_default()
+        completion = Gtk.EntryCompletion(model=self.suggestions, text_column=0)
+        # The index has already matched the text, typos included, so keep all of its suggestions.
+        completion.set_match_func(lambda *args: True)
+        completion.connect("match-selected", self.suggestion_selected)
+        self.place.set_completion(completion)
+        self.place.connect("changed", self.suggest)
+        self.connect("destroy", self.on_destroy)
         self.store = DataStore()
         self.cities = self.store.get_cities()
         self.buttons = []
+        self.temperatures = {}
 
         if len(self.cities) > 0:
-            label = Gtk.Label(label="Choose your city")
-            self.box.pack_start(label, True, True, 5)
+            heading = Gtk.Label(label="Choose your city")
+            self.box.pack_start(heading, True, True, 5)
             txt = "Or enter a new city"
         else:
             txt = "Enter your city"
 
         # Retrieve and add the city to UI.
         for city in self.cities:
+            row = Gtk.Box(spacing=5)
             btn = Gtk.Button()
             btn.connect("clicked", self.btn_click)
             btn.set_label(city[0] + "," + str(city[1]).upper())
-            self.box.pack_start(btn, True, True, 0)
+            temperature = Gtk.Label()
+            row.pack_start(btn, True, True, 0)
+            row.pack_start(temperature, False, False, 5)
+            self.box.pack_start(row, True, True, 0)
             self.buttons.append(btn)
+            self.temperatures[btn.get_label()] = temperature
         new_city = Gtk.Label(label=txt.capitalize())
         self.box.pack_start(new_city, True, True, 5)
         self.box.pack_start(self.place, True, True, 5)
@@ -46,6 +72,89 @@ class PlaceDialog(Gtk.Dialog):
         area.add(self.box)
         self.show_all()
 
+        if api is not None and self.temperatures:
+            self.pending.add(api.submit(api.run(api.api.get_current_weather_batch, list(self.temperatures)),
+                                        self.show_temperatures))
+
+    def on_destroy(self, widget):
+        """
+        Stops the search and fetches still on their way, their results have nowhere to be shown.
+
+        :param widget: dialog
+        """
+        self.destroyed = True
+        if self.search_source is not None:
+            GLib.source_remove(self.search_source)
+            self.search_source = None
+        for future in list(self.pending):
+            future.cancel()
+
+    def show_temperatures(self, future):
+        """
+        Shows the current temperature next to each city.
+
+        :param future: future holding the result of the batch fetch.
+        """
+        self.pending.discard(future)
+        if self.destroyed or future.cancelled() or future.exception() is not None:
+            return
+        units = DISPLAY_TEMP_UNITS[DataStore.get_units()]
+        for city, result in future.result().items():
+            if city in self.temperatures and not isinstance(result, APIError):
+                self.temperatures[city].set_text(str(int(result[2]['temp'])) + units)
+
+    def suggest(self, widget):
+        """
+        Searches the cities once typing pauses, on a worker thread so typing is never held up.
+
+        :param widget: entry
+        """
+        if self.search_source is not None:
+            GLib.source_remove(self.search_source)
+        self.search_source = GLib.timeout_add(CITY_SEARCH_DELAY, self.search, widget.get_text())
+
+    def search(self, text: str) -> bool:
+        """
+        Starts searching the cities matching the text.
+
+        :param text: text typed
+        :return: False so the timeout runs once.
+        """
+        self.search_source = None
+        future = self.loop.executor.submit(CityIndex().search, text)
+        self.pending.add(future)
+        self.loop.add_done_callback(future, lambda f: self.show_suggestions(text, f))
+        return False
+
+    def show_suggestions(self, text: str, future):
+        """
+        Suggests the cities found, unless more has been typed meanwhile.
+
+        :param text: text searched
+        :param future: future holding the cities found.
+        """
+        self.pending.discard(future)
+        if self.destroyed or future.cancelled() or future.exception() is not None or text != self.place.get_text():
+            return
+        self.suggestions.clear()
+        self.found = {}
+        for city in future.result():
+            self.found[city.id] = city
+            self.suggestions.append([label(city), city.id])
+        self.place.get_completion().complete()
+
+    def suggestion_selected(self, completion, model, row) -> bool:
+        """
+        Chooses a suggested city, remembering its id so that exactly this city is fetched.
+
+        :return: True as the entry is filled here.
+        """
+        city = self.found[model[row][1]]  # type: City
+        self.store.add_city((city.name, city.country), city.id)
+        self.place.set_text(label(city))
+        self.place.set_position(-1)
+        return True
+
     def btn_click(self, widget):
         """
         Select a city.
@@ -0,0 +1,122 @@
+"""
+Keeps the requests sent to a provider within its rate limits.
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Tuple
+
+from halo.DataStore import DataStore
+from halo.settings import RATE_LIMIT_PER_MINUTE, RATE_LIMIT_PER_DAY, RATE_LIMIT_RESERVE
+
+
+class TokenBucket:
+    """
+    A token bucket holding up to `capacity` tokens, refilled at `rate` tokens per second.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        """
+        :param rate: tokens added per second
+        :param capacity: maximum tokens held, which is also the largest burst allowed.
+        :param clock: monotonic clock in seconds
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.__clock = clock
+        self.__tokens = capacity
+        self.__updated = clock()
+
+    @property
+    def tokens(self) -> float:
+        """Tokens available now."""
+        now = self.__clock()
+        self.__tokens = min(self.capacity, self.__tokens + (now - self.__updated) * self.rate)
+        self.__updated = now
+        return self.__tokens
+
+    def try_acquire(self, count: float = 1) -> bool:
+        """
+        Takes tokens if enough are available.
+
+        :param count: tokens needed
+        :return: whether the tokens were taken.
+        """
+        if self.tokens < count:
+            return False
+        self.__tokens -= count
+        return True
+
+    def drain(self):
+        """Takes every token available."""
+        self.tokens
+        self.__tokens = 0
+
+
+class RequestBudget:
+    """
+    Tracks the requests sent with the api key against a per minute and a per day budget.
+    The usage of the day is kept in the DataStore, so it survives restarts.
+    """
+
+    def __init__(self, per_minute: int = RATE_LIMIT_PER_MINUTE, per_day: int = RATE_LIMIT_PER_DAY,
+                 reserve: float = RATE_LIMIT_RESERVE, clock: Callable[[], float] = time.monotonic,
+                 store: DataStore = None):
+        """
+        :param per_minute: requests allowed per minute
+        :param per_day: requests allowed per UTC day
+        :param reserve: share of either budget below which it's considered low.
+        :param clock: monotonic clock in seconds
+        :param store: store keeping the usage, defaults to the database of the app.
+        """
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.reserve = reserve
+        self.__minute = TokenBucket(per_minute / 60, per_minute, clock)
+        self.__lock = threading.Lock()
+        self.__store = store if store is not None else DataStore()
+        self.__day, self.__used = self.__store.get_request_usage()
+
+    @staticmethod
+    def today() -> str:
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+    def __roll_over(self):
+        today = self.today()
+        if self.__day != today:
+            self.__day, self.__used = today, 0
+
+    def remaining(self) -> Tuple[int, int]:
+        """
+        Returns the requests left.
+
+        :return: a tuple of the requests left this minute and today.
+        """
+        with self.__lock:
+            self.__roll_over()
+            return int(self.__minute.tokens), max(self.per_day - self.__used, 0)
+
+    def is_low(self) -> bool:
+        """Whether less than the reserve is left of either budget."""
+        minute, day = self.remaining()
+        return minute < self.per_minute * self.reserve or day < self.per_day * self.reserve
+
+    def acquire(self) -> bool:
+        """
+        Spends a request.
+
+        :return: whether the request may be sent.
+        """
+        with self.__lock:
+            self.__roll_over()
+            if self.__used >= self.per_day or not self.__minute.try_acquire():
+                return False
+            self.__used += 1
+            self.__store.set_request_usage(self.__day, self.__used)
+            return True
+
+    def exhaust(self):
+        """Spends what's left of the minute, as the provider has told us its limit is reached."""
+        with self.__lock:
+            self.__minute.drain()
@@ -0,0 +1,134 @@
+"""
+Retries failed requests and stops sending them while the provider is down.
+"""
+
+import random
+import threading
+import time
+from typing import Any, Callable, Tuple, Type
+
+from halo.settings import HTTP_RETRIES, HTTP_RETRY_DELAY, HTTP_RETRY_MAX_DELAY, HTTP_RETRY_DEADLINE, \
+    CIRCUIT_FAILURES, CIRCUIT_RESET
+
+
+class RetryPolicy:
+    """
+    Retries a call with exponential backoff and full jitter, within an overall deadline.
+    Only meant for idempotent calls, like GET requests.
+    """
+
+    def __init__(self, retries: int = HTTP_RETRIES, base_delay: float = HTTP_RETRY_DELAY,
+                 max_delay: float = HTTP_RETRY_MAX_DELAY, deadline: float = HTTP_RETRY_DEADLINE,
+                 retry_on: Tuple[Type[Exception], ...] = (Exception,), sleep: Callable[[float], None] = time.sleep,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param retries: attempts made after the first one fails
+        :param base_delay: seconds before the first retry, doubled for every following one.
+        :param max_delay: maximum seconds between attempts
+        :param deadline: seconds after the first attempt beyond which no retry is started.
+        :param retry_on: exceptions which are retried, others are raised right away.
+        :param sleep: sleeps for the given seconds
+        :param clock: monotonic clock in seconds
+        """
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retry_on = retry_on
+        self.__sleep = sleep
+        self.__clock = clock
+
+    def delay(self, attempt: int) -> float:
+        """
+        Returns a random delay before the given retry, so that clients failing together don't retry together.
+
+        :param attempt: number of the retry starting at 0
+        :return: seconds
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        Calls fn until it succeeds, raises an exception not retried or the retries are used up.
+
+        :param fn: function to be called
+        :param args: arguments of fn
+        :return: result of the call
+        """
+        start = self.__clock()
+        for attempt in range(self.retries + 1):
+            try:
+                return fn(*args)
+            except self.retry_on:
+                if attempt == self.retries:
+                    raise
+                delay = self.delay(attempt)
+                if self.__clock() + delay - start > self.deadline:
+                    raise
+                self.__sleep(delay)
+
+
+class CircuitBreaker:
+    """
+    Counts consecutive failures of a provider. After `failures` of them the circuit opens
+    and calls are refused for `reset_timeout` seconds. A single call is then let through
+    to probe the provider, closing the circuit if it succeeds or opening it again if not.
+    A probe with no outcome after `reset_timeout` seconds is given up and another is let through.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failures: int = CIRCUIT_FAILURES, reset_timeout: float = CIRCUIT_RESET,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param failures: consecutive failures opening the circuit
+        :param reset_timeout: seconds the circuit stays open
+        :param clock: monotonic clock in seconds
+        """
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self.__clock = clock
+        self.__lock = threading.Lock()
+        self.__state = CircuitBreaker.CLOSED
+        self.__count = 0
+        self.__opened = 0
+
+    @property
+    def state(self) -> str:
+        with self.__lock:
+            return self.__state
+
+    def is_open(self) -> bool:
+        """Whether calls are being refused, without taking the probe."""
+        with self.__lock:
+            return self.__state == CircuitBreaker.OPEN and self.__clock() - self.__opened < self.reset_timeout
+
+    def allow(self) -> bool:
+        """
+        Asks for a call to be made.
+
+        :return: whether the call may be made.
+        """
+        with self.__lock:
+            if self.__state == CircuitBreaker.CLOSED:
+                return True
+            now = self.__clock()
+            if now - self.__opened >= self.reset_timeout:
+                # Either the circuit has been open long enough or the last probe never reported back.
+                self.__state = CircuitBreaker.HALF_OPEN
+                self.__opened = now
+                return True
+            return False
+
+    def record_success(self):
+        with self.__lock:
+            self.__state = CircuitBreaker.CLOSED
+            self.__count = 0
+
+    def record_failure(self):
+        with self.__lock:
+            self.__count += 1
+            if self.__state == CircuitBreaker.HALF_OPEN or self.__count >= self.failures:
+                self.__state = CircuitBreaker.OPEN
+                self.__opened = self.__clock()
@@ -0,0 +1,135 @@
+"""
+Refreshes weather data in background, so it's usually cached before it's shown.
+"""
+
+import asyncio
+import time
+from typing import Callable, Dict, Optional
+
+from halo.API import APIError, RateLimitReached
+from halo.AsyncAPI import AsyncAPI
+from halo.DataStore import DataStore
+from halo.History import HistoryStore
+from halo.settings import CACHE_TTL, SCHEDULE_SAVED_DELAY, SCHEDULE_MAX_BACKOFF, HISTORY_COMPACT_INTERVAL
+
+
+class RefreshScheduler:
+    """
+    Refreshes the active city as soon as its cached current weather expires
+    and, at lower priority, every saved city once its cached forecast expires.
+    The history is compacted every HISTORY_COMPACT_INTERVAL seconds, so it
+    doesn't grow without end in a long running process.
+
+    A failing refresh is retried with exponential backoff and a reached rate
+    limit pauses all refreshes for SCHEDULE_MAX_BACKOFF seconds.
+
+    The scheduler needs a provider instance of its own as it turns off
+    stale-while-revalidate on it, so that failures are seen here.
+    """
+    ACTIVE = 'active'
+    SAVED = 'saved'
+    COMPACT = 'compact'
+
+    def __init__(self, api: AsyncAPI, on_refreshed: Callable[[str], None] = None):
+        """
+        :param api: provider used for refreshes, sharing the cache with the one of the UI.
+        :param on_refreshed: called from the event loop with the active city after it's refreshed.
+        """
+        self.api = api
+        self.api.api.stale_while_revalidate = False
+        self.on_refreshed = on_refreshed
+        self.active = None  # type: Optional[str]
+        self.intervals = {RefreshScheduler.ACTIVE: CACHE_TTL['weather'],
+                          RefreshScheduler.SAVED: CACHE_TTL['forecast'],
+                          RefreshScheduler.COMPACT: HISTORY_COMPACT_INTERVAL}
+        self.__due = {}  # type: Dict[str, float]
+        self.__failures = {}  # type: Dict[str, int]
+        self.__paused_until = 0
+        self.__wake = None  # type: Optional[asyncio.Event]
+        self.__future = None
+
+    def start(self):
+        """Starts refreshing on the event loop of the provider."""
+        if self.__future is None:
+            self.__due[RefreshScheduler.SAVED] = time.time() + SCHEDULE_SAVED_DELAY
+            self.__due[RefreshScheduler.COMPACT] = time.time() + HISTORY_COMPACT_INTERVAL
+            self.__future = self.api.submit(self.__run())
+
+    def stop(self):
+        """Stops refreshing."""
+        if self.__future is not None:
+            self.__future.cancel()
+            self.__future = None
+
+    def set_active(self, city: str):
+        """
+        Sets the city shown, which is refreshed once its data expires.
+
+        :param city: city
+        """
+        if city != self.active:
+            self.active = city
+            self.__failures.pop(RefreshScheduler.ACTIVE, None)
+        self.__due[RefreshScheduler.ACTIVE] = time.time() + self.intervals[RefreshScheduler.ACTIVE]
+        if self.__wake is not None:
+            self.api.loop.loop.call_soon_threadsafe(self.__wake.set)
+
+    def next_due(self) -> Optional[tuple]:
+        """
+        Returns the next refresh, the active city first when both are due.
+
+        :return: a tuple of time and name of refresh or None if nothing is scheduled.
+        """
+        due = [(at if name == RefreshScheduler.COMPACT else max(at, self.__paused_until),
+                0 if name == RefreshScheduler.ACTIVE else 1, name)
+               for name, at in self.__due.items() if name != RefreshScheduler.ACTIVE or self.active]
+        if not due:
+            return None
+        at, _, name = min(due)
+        return at, name
+
+    async def __run(self):
+        self.__wake = asyncio.Event()
+        while True:
+            due = self.next_due()
+            timeout = None if due is None else max(due[0] - time.time(), 0)
+            try:
+                await asyncio.wait_for(self.__wake.wait(), timeout)
+                self.__wake.clear()
+                continue  # The schedule has changed.
+            except asyncio.TimeoutError:
+                pass
+            await self.refresh(due[1])
+
+    async def refresh(self, name: str):
+        """
+        Runs a refresh and schedules the next one.
+
+        :param name: ACTIVE, SAVED or COMPACT
+        """
+        city = self.active
+        interval = self.intervals[name]
+        try:
+            if name == RefreshScheduler.COMPACT:
+                HistoryStore().compact()  # Only queued, the writer thread does the work.
+            elif name == RefreshScheduler.ACTIVE:
+                await self.api.get_current_weather(city)
+                await self.api.get_forecast_weather(city)
+            else:
+                cities = ["{},{}".format(c[0], str(c[1]).upper()) for c in DataStore().get_cities()]
+                for batch in (self.api.api.get_current_weather_batch, self.api.api.get_forecast_weather_batch):
+                    results = await self.api.run(batch, cities)
+                    for result in results.values():
+                        if isinstance(result, RateLimitReached):
+                            raise result
+        except RateLimitReached:
+            self.__paused_until = time.time() + SCHEDULE_MAX_BACKOFF
+        except (APIError, asyncio.TimeoutError):
+            failures = self.__failures.get(name, 0) + 1
+            self.__failures[name] = failures
+            interval = min(interval * 2 ** failures, SCHEDULE_MAX_BACKOFF)
+        else:
+            self.__failures.pop(name, None)
+            if name == RefreshScheduler.ACTIVE and self.on_refreshed is not None and city == self.active:
+                self.on_refreshed(city)
+        self.__due[name] = time.time() + interval
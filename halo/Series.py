@@ -0,0 +1,102 @@
+"""
+Compact columnar storage of weather data points.
+"""
+
+from array import array
+from collections import namedtuple
+from typing import Any, Dict, Iterable
+
+from halo.Conditions import get_condition
+
+Observation = namedtuple('Observation', ['dt', 'temp', 'humidity', 'pressure', 'wind', 'code', 'day'])
+""" A single data point of a :class:`WeatherSeries`."""
+
+
+class WeatherSeries:
+    """
+    A series of weather data points stored as typed arrays, one per field.
+
+    It holds only the fields used by Halo, so a 5 day forecast takes a few
+    kilobytes instead of the decoded response with all of its nested dicts.
+    """
+    __slots__ = ('dt', 'temp', 'humidity', 'pressure', 'wind', 'code', 'day')
+
+    def __init__(self):
+        self.dt = array('q')
+        """ unix timestamps"""
+        self.temp = array('d')
+        self.humidity = array('d')
+        self.pressure = array('d')
+        self.wind = array('d')
+        """ wind speed"""
+        self.code = array('H')
+        """ weather condition codes, 0 when unknown."""
+        self.day = array('b')
+        """ 1 for day time, 0 for night."""
+
+    @classmethod
+    def from_items(cls, items: Iterable[Dict[str, Any]], provider: str = 'openweathermap') -> 'WeatherSeries':
+        """
+        Builds a series from the items of a decoded response.
+
+        :param items: list of data points of the response.
+        :param provider: provider name used to look up the condition codes.
+        :return: series
+        """
+        series = cls()
+        for item in items:
+            series.append_item(item, provider)
+        return series
+
+    def append_item(self, item: Dict[str, Any], provider: str = 'openweathermap'):
+        """
+        Appends a data point of a decoded response.
+
+        :param item: data point
+        :param provider: provider name used to look up the condition codes.
+        """
+        main = item['main']
+        icon = item['weather'][0]['icon'] if item.get('weather') else ''
+        condition = get_condition(provider, icon)
+        self.append(item['dt'], main['temp'], main.get('humidity', 0), main.get('pressure', 0),
+                    item.get('wind', {}).get('speed', 0),
+                    condition.code if condition is not None else 0,
+                    condition.day if condition is not None else not icon.endswith('n'))
+
+    def append(self, dt: int, temp: float, humidity: float = 0, pressure: float = 0, wind: float = 0,
+               code: int = 0, day: bool = True):
+        """Appends a data point."""
+        self.dt.append(int(dt))
+        self.temp.append(temp)
+        self.humidity.append(humidity)
+        self.pressure.append(pressure)
+        self.wind.append(wind)
+        self.code.append(code)
+        self.day.append(1 if day else 0)
+
+    def __len__(self) -> int:
+        return len(self.dt)
+
+    def __getitem__(self, i: int) -> Observation:
+        return Observation(self.dt[i], self.temp[i], self.humidity[i], self.pressure[i], self.wind[i],
+                           self.code[i], bool(self.day[i]))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def mean_temp(self) -> float:
+        """
+        Returns the mean temperature.
+
+        :return: mean or 0 for an empty series.
+        """
+        return sum(self.temp) / len(self.temp) if self.temp else 0
+
+    def temp_range(self) -> tuple:
+        """
+        Returns the lowest and highest temperature.
+
+        :return: a tuple of min and max or None for an empty series.
+        """
+        return (min(self.temp), max(self.temp)) if self.temp else None
@@ -0,0 +1,204 @@
+"""
+Serves cached weather data over a small local HTTP API, so that many Halo instances
+can share one upstream provider. Point them at it with the 'remote' provider.
+
+Endpoints, answered with the JSON of the upstream provider:
+
+    GET /weather?q=London,GB        current weather, also by id=...
+    GET /group?id=2643743,1254187   current weather of many cities
+    GET /forecast?q=London,GB       forecast
+    GET /history?q=London,GB&tz=Europe/London
+                                    observations of the previous day as a list of
+                                    {dt, temp, humidity, pressure, wind, code, day}
+
+Every response carries an ETag and requests with a matching If-None-Match are
+answered with 304 Not Modified.
+"""
+
+import asyncio
+import hashlib
+import json
+from email.utils import formatdate
+from typing import Tuple
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from halo.API import API, APIError, NotFound, RateLimitReached, ServiceUnavailable
+from halo.DataStore import DataStore
+from halo.History import HistoryStore
+from halo.settings import SERVER_HOST, SERVER_PORT, CACHE_TTL, HISTORY_COMPACT_INTERVAL
+
+REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           429: 'Too Many Requests', 502: 'Bad Gateway', 503: 'Service Unavailable'}
+LOOKUP_PARAMS = ('q', 'id', 'lat', 'lon')
+"""query parameters naming the city, passed on to the provider in this order."""
+
+
+class WeatherServer:
+    """
+    An HTTP/1.1 server on an asyncio loop. Connections are kept alive and the blocking
+    provider calls run on the default executor, where identical requests are coalesced
+    and fresh responses come from the cache.
+    """
+
+    def __init__(self, api: API, host: str = SERVER_HOST, port: int = SERVER_PORT):
+        """
+        :param api: upstream provider
+        :param host: address listened on
+        :param port: port listened on, 0 picks a free one.
+        """
+        self.api = api
+        self.host = host
+        self.port = port
+        self.server = None  # type: asyncio.AbstractServer
+        self.__compaction = None  # type: asyncio.Task
+
+    async def start(self):
+        """Starts listening, updating port with the one picked."""
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.__compaction = asyncio.ensure_future(self.compact_history())
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        if self.__compaction is not None:
+            self.__compaction.cancel()
+
+    @staticmethod
+    async def compact_history():
+        """Keeps compacting the history recorded from the responses, as the server may run for months."""
+        while True:
+            await asyncio.sleep(HISTORY_COMPACT_INTERVAL)
+            HistoryStore().compact()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answers the requests of a connection until the client is done."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    method, target, version = line.decode('latin-1').split()
+                except ValueError:
+                    self.write(writer, 400, self.error(400, "Malformed request line."), keep_alive=False)
+                    break
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                if method not in ('GET', 'HEAD'):
+                    status, body = 405, self.error(405, "Only GET is supported.")
+                else:
+                    status, body = await self.respond(target)
+
+                etag = None
+                if status == 200:
+                    etag = '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+                    if etag in headers.get('if-none-match', ''):
+                        status, body = 304, b''
+                self.write(writer, status, body if method == 'GET' else b'', etag, keep_alive, len(body))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def write(writer: asyncio.StreamWriter, status: int, body: bytes, etag: str = None, keep_alive: bool = True,
+              length: int = None):
+        head = ["HTTP/1.1 %d %s" % (status, REASONS.get(status, '')),
+                "Date: " + formatdate(usegmt=True),
+                "Content-Type: application/json; charset=utf-8",
+                "Content-Length: %d" % (len(body) if length is None else length),
+                "Connection: " + ("keep-alive" if keep_alive else "close")]
+        if etag is not None:
+            head.append("ETag: " + etag)
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+
+    @staticmethod
+    def error(status: int, message: str) -> bytes:
+        return json.dumps({'cod': str(status), 'message': message}).encode()
+
+    async def respond(self, target: str) -> Tuple[int, bytes]:
+        """
+        Fetches the data a request asks for.
+
+        :param target: path and query of the request
+        :return: a tuple of the status and body of the response.
+        """
+        parts = urlsplit(target)
+        slug = parts.path.strip('/')
+        params = dict(parse_qsl(parts.query))
+        units = self.api.get_units()
+        if params.get('units', units) != units:
+            return 400, self.error(400, "Only units=%s is served." % units)
+        # Encoded again, so a decoded '&' can't add parameters of its own to the upstream request.
+        query = urlencode([(k, params[k]) for k in LOOKUP_PARAMS if k in params], safe=',')
+        if not query or slug not in ('weather', 'group', 'forecast', 'history'):
+            return 404, self.error(404, "Unknown endpoint.")
+
+        loop = asyncio.get_event_loop()
+        try:
+            if slug == 'history':
+                return 200, await loop.run_in_executor(None, self.history, query, params.get('tz', 'UTC'))
+            return 200, await loop.run_in_executor(None, self.upstream, slug, query)
+        except NotFound as e:
+            return 404, self.error(404, str(e))
+        except RateLimitReached as e:
+            return 429, self.error(429, str(e))
+        except ServiceUnavailable as e:
+            return 503, self.error(503, str(e))
+        except APIError as e:
+            return 502, self.error(502, str(e))
+
+    def upstream(self, slug: str, query: str) -> bytes:
+        """Returns the json of a provider response, as it's kept in the cache when possible."""
+        key = self.api._cache_key(slug, query)
+        cached = self.api.cache.get_raw(*key)
+        if cached is not None and cached[1] < CACHE_TTL.get(slug, 0):
+            return cached[0].encode()  # Fresh, so skip decoding it just to encode it again.
+        data = self.api._cached_request(slug, query, "weather info" if slug != 'forecast' else "forecast data")
+        cached = self.api.cache.get_raw(*key)
+        return cached[0].encode() if cached is not None else json.dumps(data).encode()
+
+    def history(self, query: str, tz: str) -> bytes:
+        """Returns the observations of the previous day, from the provider if it has them."""
+        if self.api.has_historical:
+            series = self.api.get_weather_history(query, tz)
+        elif query.startswith('q='):
+            city = self.api.get_current_weather(dict(parse_qsl(query))['q'])[0]
+            series = HistoryStore().get_yesterday(city, tz)
+        else:
+            raise NotFound("History is only available by city name.")
+        items = [dict(point._asdict(), day=bool(point.day)) for point in series]
+        return json.dumps({'cnt': len(items), 'list': items}).encode()
+
+
+def serve(api: API, host: str = SERVER_HOST, port: int = SERVER_PORT):
+    """
+    Runs the server until interrupted.
+
+    :param api: upstream provider
+    :param host: address listened on
+    :param port: port listened on
+    """
+    server = WeatherServer(api, host, port)
+    print("Serving weather on http://%s:%d" % (host, port))
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    DataStore().flush()
@@ -0,0 +1,50 @@
+"""
+Coalesces identical calls made at the same time.
+"""
+
+import concurrent.futures
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Runs a call once for every caller asking for the same key while it's in flight.
+    Callers arriving later wait for the first one and get its result or exception.
+    """
+
+    def __init__(self):
+        self.__calls = {}  # type: Dict[Hashable, concurrent.futures.Future]
+        self.__lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args) -> Any:
+        """
+        Calls fn unless a call with the same key is in flight, then waits for that one.
+
+        :param key: identifies identical calls, like the url of a request.
+        :param fn: function to be called
+        :param args: arguments of fn
+        :return: result of the call
+        """
+        with self.__lock:
+            future = self.__calls.get(key)
+            owner = future is None
+            if owner:
+                future = self.__calls[key] = concurrent.futures.Future()
+        if not owner:
+            return future.result()
+        try:
+            result = fn(*args)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Whether a call with the key is running."""
+        with self.__lock:
+            return key in self.__calls
@@ -0,0 +1,143 @@
+from bisect import bisect_left
+from typing import Callable, List, Optional, Sequence
+
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import Gtk, Gdk  # noqa: E402
+
+
+def nearest_index(xs: Sequence[float], x: float) -> Optional[int]:
+    """
+    Returns the index of the value in sorted xs nearest to x using a binary search.
+
+    :param xs: ascending x coordinates
+    :param x: x coordinate
+    :return: index or None when xs is empty.
+    """
+    if not xs:
+        return None
+    i = bisect_left(xs, x)
+    if i == 0:
+        return 0
+    if i == len(xs):
+        return len(xs) - 1
+    return i if xs[i] - x < x - xs[i - 1] else i - 1
+
+
+class Sparkline(Gtk.DrawingArea):
+    """
+    A light weight trend chart drawn with cairo.
+
+    It draws a single white line with the lowest and highest values marked
+    on the left. Hovering marks the nearest point and only the area around
+    the old and new marker is redrawn.
+    """
+    padding = (40, 10, 10, 10)
+    """ left, top, right and bottom padding in pixels."""
+    marker_radius = 3
+
+    def __init__(self, on_hover: Callable[[int], None] = None, on_leave: Callable[[], None] = None):
+        """
+        :param on_hover: called with the index of the value under the pointer when it changes.
+        :param on_leave: called when the pointer leaves the chart.
+        """
+        super().__init__()
+        self.on_hover = on_hover
+        self.on_leave = on_leave
+        self.values = []  # type: List[float]
+        self.xs = []  # type: List[float]
+        self.ys = []  # type: List[float]
+        self.hover_index = None  # type: Optional[int]
+
+        self.set_size_request(500, 100)
+        self.add_events(Gdk.EventMask.POINTER_MOTION_MASK | Gdk.EventMask.LEAVE_NOTIFY_MASK)
+        self.connect('draw', self.on_draw)
+        self.connect('size-allocate', lambda w, rect: self.layout())
+        self.connect('motion-notify-event', self.on_motion)
+        self.connect('leave-notify-event', self.on_leave_notify)
+
+    def set_values(self, values: List[float]):
+        """
+        Replaces the values shown and redraws the whole chart.
+
+        :param values: values
+        """
+        self.values = list(values)
+        self.hover_index = None
+        self.layout()
+        self.queue_draw()
+
+    def layout(self):
+        """Computes the position of every point for the current size."""
+        left, top, right, bottom = self.padding
+        width = max(self.get_allocated_width() - left - right, 1)
+        height = max(self.get_allocated_height() - top - bottom, 1)
+        count = len(self.values)
+        if count == 0:
+            self.xs, self.ys = [], []
+            return
+        low, high = min(self.values), max(self.values)
+        span = (high - low) or 1
+        step = width / (count - 1) if count > 1 else 0
+        self.xs = [left + i * step for i in range(count)]
+        self.ys = [top + height - (v - low) * height / span for v in self.values]
+
+    def index_at(self, x: float) -> Optional[int]:
+        """
+        Returns the index of the point nearest to x.
+
+        :param x: x coordinate in pixels.
+        :return: index or None when there are no values.
+        """
+        return nearest_index(self.xs, x)
+
+    def on_draw(self, widget, cr):
+        if not self.xs:
+            return False
+        x1, _, x2, _ = cr.clip_extents()
+
+        # Only the segments crossing the damaged area are drawn.
+        first = max((self.index_at(x1) or 0) - 1, 0)
+        last = min((self.index_at(x2) or 0) + 1, len(self.xs) - 1)
+        cr.set_source_rgb(1, 1, 1)
+        cr.set_line_width(1.5)
+        cr.move_to(self.xs[first], self.ys[first])
+        for i in range(first + 1, last + 1):
+            cr.line_to(self.xs[i], self.ys[i])
+        cr.stroke()
+
+        if x1 < self.padding[0]:
+            cr.select_font_face("Lato")
+            cr.set_font_size(10)
+            cr.move_to(2, self.padding[1] + 4)
+            cr.show_text("{:g}".format(round(max(self.values), 1)))
+            cr.move_to(2, self.get_allocated_height() - self.padding[3])
+            cr.show_text("{:g}".format(round(min(self.values), 1)))
+
+        if self.hover_index is not None:
+            cr.arc(self.xs[self.hover_index], self.ys[self.hover_index], self.marker_radius, 0, 6.2832)
+            cr.fill()
+        return False
+
+    def on_motion(self, widget, event):
+        index = self.index_at(event.x)
+        if index is not None and index != self.hover_index:
+            self.__mark(index)
+            if self.on_hover is not None:
+                self.on_hover(index)
+        return False
+
+    def on_leave_notify(self, widget, event):
+        self.__mark(None)
+        if self.on_leave is not None:
+            self.on_leave()
+        return False
+
+    def __mark(self, index: Optional[int]):
+        """Moves the hover marker, redrawing only around its old and new position."""
+        for i in (self.hover_index, index):
+            if i is not None:
+                r = self.marker_radius + 2
+                self.queue_draw_area(int(self.xs[i] - r), int(self.ys[i] - r), 2 * r + 1, 2 * r + 1)
+        self.hover_index = index
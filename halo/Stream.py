@@ -0,0 +1,114 @@
+"""
+Incremental parsing of JSON responses.
+"""
+
+import codecs
+import json
+from typing import Any, Iterable, Iterator, Optional, Union
+
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_array(chunks: Iterable[Union[bytes, str]], key: Optional[str]) -> Iterator[Any]:
+    """
+    Yields the items of the array stored under `key` in the top level object
+    of a JSON document while its chunks arrive. Only one item is decoded at a
+    time and the text consumed so far is dropped, so neither the whole text
+    nor the whole object tree is held in memory.
+
+    Remaining chunks are read to the end after the array, so that sources
+    which do something once exhausted (like caching) get to finish.
+
+    :param chunks: the document as chunks of utf-8 bytes or text.
+    :param key: name of array, or None if the document is the array itself.
+    :return: iterator of decoded items.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buf = ''
+    pos = 0
+    eof = False
+
+    def more(keep: int = None) -> bool:
+        """Reads the next chunk, dropping the text before `keep` (defaults to the current position)."""
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        keep = pos if keep is None else keep
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            eof = True
+            chunk = utf8.decode(b'', True)
+        else:
+            chunk = utf8.decode(chunk) if isinstance(chunk, bytes) else chunk
+        buf = buf[keep:] + chunk
+        pos -= keep
+        return not eof
+
+    # Find the key among the members of the top level object.
+    depth = 0
+    in_string = False
+    escaped = False
+    string_start = 0
+    expect_array = key is None
+    found = False
+    while not found:
+        if pos >= len(buf):
+            keep = string_start if in_string else pos
+            if not more(keep):
+                return
+            string_start -= keep
+            continue
+        c = buf[pos]
+        pos += 1
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == '\\':
+                escaped = True
+            elif c == '"':
+                in_string = False
+                expect_array = depth == 1 and json.loads(buf[string_start:pos]) == key
+            continue
+        if c == '"':
+            in_string = True
+            string_start = pos - 1
+        elif c == ':':
+            continue
+        elif c in '{[':
+            if c == '[' and expect_array:
+                found = True
+            depth += 1
+            expect_array = False
+        elif c in '}]':
+            depth -= 1
+        elif c not in _WHITESPACE:
+            expect_array = False
+
+    # Decode the items one by one.
+    while True:
+        while pos < len(buf) and buf[pos] in _WHITESPACE + ',':
+            pos += 1
+        if pos >= len(buf):
+            if not more():
+                raise ValueError("Unexpected end of document in array '{}'".format(key))
+            continue
+        if buf[pos] == ']':
+            break
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            if not more():
+                raise
+            continue
+        if not eof and (end == len(buf) or buf[end] not in _WHITESPACE + ',]'):
+            # A number may go on in the next chunk, so only an item followed by a separator is complete.
+            more()
+            continue
+        pos = end
+        yield item
+
+    for _ in chunks:
+        pass
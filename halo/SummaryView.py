@@ -1,21 +1,47 @@
+import importlib.util
+import threading
 from datetime import datetime
+from typing import Callable, Sequence
 
 import gi
-from matplotlib import rcParams
-from matplotlib.backend_bases import MouseEvent
-from matplotlib.backends.backend_gtk3agg import FigureCanvasGTK3Agg as FigureCanvas
-from matplotlib.figure import Figure
 
-from halo.API import OpenWeatherMap
 from halo.DataStore import DataStore
 from halo.Icon import Icon
-from halo.settings import DISPLAY_TEMP_UNITS
+from halo.Series import WeatherSeries
+from halo.Sparkline import Sparkline, nearest_index
+from halo.settings import DISPLAY_TEMP_UNITS, CHART_BACKEND
 
 gi.require_version("Gtk", "3.0")
-from gi.repository import Gtk  # noqa: E402
+from gi.repository import Gtk, GLib  # noqa: E402
 
-rcParams['font.family'] = 'sans-serif'
-rcParams['font.sans-serif'] = ['Lato']
+
+def get_chart_backend() -> str:
+    """
+    Returns the chart backend to use, falling back to cairo when matplotlib isn't installed.
+
+    :return: 'cairo' or 'matplotlib'
+    """
+    if CHART_BACKEND == 'matplotlib' and importlib.util.find_spec('matplotlib') is not None:
+        return 'matplotlib'
+    return 'cairo'
+
+
+def load_charting(done: Callable[[], None]):
+    """
+    Imports matplotlib in background as it dominates the startup time.
+
+    :param done: called on the main loop once charts can be created.
+    """
+    def run():
+        from matplotlib import rcParams
+        import matplotlib.figure  # noqa: F401
+        import matplotlib.backends.backend_gtk3agg  # noqa: F401
+
+        rcParams['font.family'] = 'sans-serif'
+        rcParams['font.sans-serif'] = ['Lato', 'DejaVu Sans']
+        GLib.idle_add(done)
+
+    threading.Thread(target=run, name="halo-load-charting", daemon=True).start()
 
 
 class SummaryView:
@@ -23,15 +49,22 @@ class SummaryView:
     Display the trends chart and daily summary of weather data.
     """
 
-    def __init__(self, single_day_mode: bool = False):
+    def __init__(self, single_day_mode: bool = False, backend: str = None):
         """
         Initialises charting and summary.
 
         :param single_day_mode: Set to true to render
         summary of single item(used in historic view).
+        :param backend: 'cairo' or 'matplotlib', defaults to :func:`get_chart_backend`.
         """
         self.single_day_mode = single_day_mode
-        self.chart_data = []
+        self.backend = backend if backend is not None else get_chart_backend()
+        self.chart_data = []  # type: Sequence[float]
+        self.labels = []
+        """ hover label of each chart value, formatted at render."""
+        self.xs = []
+        """ x coordinate in pixels of each chart value, used by the matplotlib hover."""
+        self.hover_index = None
         self.view = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
         self.chart = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
         self.summary = Gtk.Box(spacing=10)
@@ -54,7 +87,31 @@ class SummaryView:
             self.items.append([status, temperature, time])
             self.summary.pack_start(item, True, True, 10)
 
-        # Initializing and Formatting Charts
+        # A matplotlib chart is created by enable_chart once matplotlib is loaded.
+        self.fig = None
+        self.axis = None
+        if self.backend == 'matplotlib':
+            self.canvas = None
+            self.placeholder = Gtk.DrawingArea()
+            self.placeholder.set_size_request(500, 100)
+        else:
+            self.canvas = Sparkline(self.show_value, self.hide_label)
+            self.placeholder = self.canvas
+        self.chart.pack_start(self.label, True, True, 0)
+        self.chart.pack_start(self.placeholder, True, True, 0)
+
+        self.view.pack_start(self.chart, False, False, 20)
+        self.view.pack_start(self.summary, False, False, 15)
+
+    def enable_chart(self):
+        """
+        Initializes and formats the matplotlib chart in place of the placeholder.
+        """
+        if self.backend != 'matplotlib' or self.canvas is not None:
+            return
+        from matplotlib.backends.backend_gtk3agg import FigureCanvasGTK3Agg as FigureCanvas
+        from matplotlib.figure import Figure
+
         self.fig = Figure(figsize=(5, 1), dpi=100)
         self.axis = self.fig.add_subplot(111)
 
@@ -72,13 +129,11 @@ class SummaryView:
 
         self.canvas.mpl_connect('motion_notify_event', self.hover)
         self.canvas.mpl_connect('axes_leave_event', self.hide_label)
-        self.chart.pack_start(self.label, True, True, 0)
+        self.canvas.mpl_connect('draw_event', self.layout)
+        self.chart.remove(self.placeholder)
         self.chart.pack_start(self.canvas, True, True, 0)
-
-        self.view.pack_start(self.chart, False, False, 20)
-        self.view.pack_start(self.summary, False, False, 15)
-
-        self._store = DataStore()
+        self.canvas.show()
+        self.plot()
 
     def get_view(self) -> Gtk.Box:
         """
@@ -88,37 +143,72 @@ class SummaryView:
         """
         return self.view
 
-    def render(self, weather_data: list, chart_data: list):
+    def render(self, weather: WeatherSeries):
         """
         Update the GUI data.
 
-        :param weather_data: Weather data
-        :param chart_data: Charting data
+        :param weather: Weather data, its temperatures are charted.
         """
-        self.chart_data = chart_data
-        self._store.refresh_preference()
+        self.chart_data = weather.temp
+        units = DISPLAY_TEMP_UNITS[DataStore.get_units()]
+        self.labels = ["{:g}".format(value) + units for value in self.chart_data]
+        self.hover_index = None
         # Summary
-        for weather, box in zip(weather_data, self.items):
-            box[2].set_text(str(int(weather['main']['temp'])) + DISPLAY_TEMP_UNITS[self._store.get_units()])
-            box[1].set_text(datetime.fromtimestamp(weather['dt']).strftime("%-I %p"))
+        for i, box in zip(range(len(weather)), self.items):
+            box[2].set_text(str(int(weather.temp[i])) + units)
+            box[1].set_text(datetime.fromtimestamp(weather.dt[i]).strftime("%-I %p"))
             if not self.single_day_mode:
-                box[0].set_from_pixbuf(Icon.get_icon(OpenWeatherMap.get_icons(weather['weather'][0]['icon'])))
+                Icon.show(box[0], weather.code[i])
         if self.single_day_mode:
             self.items[0][1].set_text("Yesterday")
 
-        # Chart
+        self.plot()
+
+    def plot(self):
+        """
+        Draws the chart data, if the chart is loaded.
+        """
+        if self.backend != 'matplotlib':
+            self.canvas.set_values(self.chart_data)
+            return
+        if self.axis is None:
+            return
         self.axis.clear()
         self.axis.patch.set_visible(False)
         self.axis.get_xaxis().set_ticks([])
-        self.axis.plot(list(range(len(chart_data))), self.chart_data, 'w-')
+        self.axis.plot(list(range(len(self.chart_data))), self.chart_data, 'w-')
+        self.canvas.draw_idle()
+
+    def layout(self, event=None):
+        """
+        Computes the x coordinate in pixels of each value of the matplotlib chart.
+        It's called after every draw as the chart may have been resized.
+        """
+        if self.axis is None or not self.chart_data:
+            self.xs = []
+            return
+        x0 = self.axis.transData.transform((0, 0))[0]
+        x1 = self.axis.transData.transform((1, 0))[0]
+        self.xs = [x0 + i * (x1 - x0) for i in range(len(self.chart_data))]
 
-    def hover(self, event: MouseEvent):
-        if event.inaxes is not self.axis:
+    def hover(self, event):
+        if self.axis is None or event.inaxes is not self.axis:
             return
-        x = int(event.xdata)
-        if x >= len(self.chart_data) or x < 0:
+        index = nearest_index(self.xs, event.x)
+        if index is not None:
+            self.show_value(index)
+
+    def show_value(self, x: int):
+        """
+        Shows the value of the chart at index x.
+
+        :param x: index of chart data
+        """
+        if x == self.hover_index or x >= len(self.labels) or x < 0:
             return
-        self.label.set_text(str(self.chart_data[x]) + DISPLAY_TEMP_UNITS[self._store.get_units()])
+        self.hover_index = x
+        self.label.set_text(self.labels[x])
 
-    def hide_label(self, event):
+    def hide_label(self, event=None):
+        self.hover_index = None
         self.label.set_text("")
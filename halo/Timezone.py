@@ -0,0 +1,166 @@
+"""
+Resolves the timezone of a place offline, from the coordinates of the zones bundled with pytz.
+"""
+
+import math
+import threading
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import pytz
+
+GRID_SIZE = 10
+""" degrees of latitude and longitude covered by a cell of the index."""
+
+Zone = NamedTuple('Zone', [('name', str), ('country', str), ('lat', float), ('lon', float)])
+
+
+def parse_coordinates(text: str) -> Tuple[float, float]:
+    """
+    Parses the ISO 6709 coordinates of zone.tab, like +4230+00131 or -332510+1511521.
+
+    :param text: coordinates
+    :return: a tuple of latitude and longitude in degrees.
+    """
+    split = max(text.rfind('+'), text.rfind('-'))
+
+    def degrees(part: str, digits: int) -> float:
+        sign = -1 if part[0] == '-' else 1
+        value = int(part[1:1 + digits]) + int(part[1 + digits:3 + digits]) / 60
+        if len(part) > 3 + digits:
+            value += int(part[3 + digits:5 + digits]) / 3600
+        return sign * value
+
+    return degrees(text[:split], 2), degrees(text[split:], 3)
+
+
+def distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Returns the great circle distance between two points in km."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371 * math.asin(min(1, math.sqrt(a)))
+
+
+class ZoneIndex:
+    """
+    A grid of the zones of zone.tab by their coordinates, to find the nearest one
+    matching a condition without scanning every zone.
+    """
+    __default = None
+    __default_lock = threading.Lock()
+
+    def __init__(self, zones: List[Zone]):
+        self.zones = zones
+        self.grid = {}  # type: Dict[Tuple[int, int], List[Zone]]
+        for zone in zones:
+            self.grid.setdefault(self.cell(zone.lat, zone.lon), []).append(zone)
+
+    @staticmethod
+    def get_default() -> 'ZoneIndex':
+        """
+        Returns the index of the zones bundled with pytz, built on first use.
+
+        :return: index
+        """
+        with ZoneIndex.__default_lock:
+            if ZoneIndex.__default is None:
+                zones = []
+                with pytz.open_resource('zone.tab') as f:
+                    for line in f:
+                        line = line.decode('utf-8')
+                        if line.startswith('#'):
+                            continue
+                        fields = line.rstrip('\n').split('\t')
+                        if len(fields) >= 3 and fields[2] in pytz.all_timezones_set:
+                            zones.append(Zone(fields[2], fields[0], *parse_coordinates(fields[1])))
+                ZoneIndex.__default = ZoneIndex(zones)
+            return ZoneIndex.__default
+
+    @staticmethod
+    def cell(lat: float, lon: float) -> Tuple[int, int]:
+        return int(math.floor(lat / GRID_SIZE)), int(math.floor(lon / GRID_SIZE)) % (360 // GRID_SIZE)
+
+    def nearest(self, lat: float, lon: float, accept: Callable[[Zone], bool] = lambda zone: True) -> Optional[Zone]:
+        """
+        Finds the zone nearest to a point among the accepted ones, searching the cells
+        in growing rings around the point.
+
+        :param lat: latitude
+        :param lon: longitude
+        :param accept: condition a zone must meet
+        :return: zone or None if none is accepted.
+        """
+        row, column = self.cell(lat, lon)
+        columns = 360 // GRID_SIZE
+        best, best_distance = None, float('inf')
+        for ring in range(columns // 2 + 1):
+            # Every zone of this ring or beyond is at least this far away, as meridians converge polewards.
+            poleward = math.radians(min(90, abs(lat) + ring * GRID_SIZE))
+            if best is not None and (ring - 1) * GRID_SIZE * 111 * math.cos(poleward) > best_distance:
+                break
+            for r in range(row - ring, row + ring + 1):
+                for c in range(column - ring, column + ring + 1):
+                    if max(abs(r - row), abs(c - column)) != ring:
+                        continue
+                    for zone in self.grid.get((r, c % columns), ()):
+                        if accept(zone):
+                            d = distance(lat, lon, zone.lat, zone.lon)
+                            if d < best_distance:
+                                best, best_distance = zone, d
+        return best
+
+
+def utc_offset(name: str, now: datetime = None) -> int:
+    """Returns the current offset of a zone from UTC in seconds."""
+    offset = pytz.timezone(name).utcoffset(now or datetime.utcnow())
+    return int(offset.total_seconds())
+
+
+@lru_cache(maxsize=256)
+def resolve_timezone(lat: float = None, lon: float = None, offset: int = None, country: str = None) -> str:
+    """
+    Resolves the timezone of a place. With coordinates the nearest zone having the given
+    UTC offset is picked, preferring the zones of the country. Without them the first
+    zone of the country having the offset is used.
+
+    :param lat: latitude
+    :param lon: longitude
+    :param offset: current offset from UTC in seconds, as reported by the provider.
+    :param country: ISO 3166 country code
+    :return: zone name, 'UTC' if nothing is known about the place.
+    """
+    country = country.upper() if country else None
+    now = datetime.utcnow()
+
+    def matches(name: str) -> bool:
+        return offset is None or utc_offset(name, now) == offset
+
+    if lat is not None and lon is not None:
+        index = ZoneIndex.get_default()
+        for accept in (lambda z: z.country == country and matches(z.name), lambda z: matches(z.name),
+                       lambda z: z.country == country):
+            zone = index.nearest(lat, lon, accept)
+            if zone is not None:
+                return zone.name
+    if country in pytz.country_timezones:
+        zones = pytz.country_timezones(country)
+        return next((name for name in zones if matches(name)), zones[0])
+    if offset is not None and offset % 3600 == 0 and abs(offset) <= 12 * 3600:
+        # Etc zones have their sign inverted.
+        return 'Etc/GMT%+d' % (-offset // 3600) if offset else 'UTC'
+    return 'UTC'
+
+
+@lru_cache(maxsize=64)
+def get_tzinfo(name: str) -> pytz.BaseTzInfo:
+    """
+    Returns the tzinfo of a zone, looked up once.
+
+    :param name: zone name
+    :return: tzinfo, UTC for unknown zones.
+    """
+    try:
+        return pytz.timezone(name)
+    except pytz.UnknownTimeZoneError:
+        return pytz.utc
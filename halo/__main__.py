@@ -1,9 +1,13 @@
 import sys
 
-from halo.app import Halo
-
 
 def main():
+    # The command line must start without loading Gtk, so the app is imported only when it's needed.
+    if '--headless' in sys.argv[1:]:
+        from halo.cli import main as headless
+        sys.exit(headless([arg for arg in sys.argv[1:] if arg != '--headless']))
+
+    from halo.app import Halo
     app = Halo()
     exit_status = app.run(sys.argv)
     sys.exit(exit_status)
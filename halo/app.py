@@ -1,28 +1,33 @@
 #!/usr/bin/env python3
 
-import concurrent.futures
+import asyncio
+import os
 import sys
-import threading
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 
 import gi
 import pytz
-from matplotlib import rcParams
 
-from halo.API import OpenWeatherMap, APIError, RateLimitReached, NotFound, get_location
+from halo.API import APIError, RateLimitReached, NotFound, create_provider
+from halo.AsyncAPI import AsyncAPI, EventLoop
+from halo.Background import Background
+from halo.CityIndex import CityIndex
 from halo.DataStore import DataStore
+from halo.History import HistoryStore
 from halo.Icon import Icon
 from halo.Place import PlaceDialog
 from halo.Preference import PreferenceDialog
-from halo.SummaryView import SummaryView
-from halo.settings import BASE, VERSION, DEFAULT_SCREEN_HEIGHT, DEFAULT_SCREEN_WIDTH, DISPLAY_TEMP_UNITS
+from halo.Scheduler import RefreshScheduler
+from halo.Series import WeatherSeries
+from halo.Timezone import get_tzinfo
+from halo.SummaryView import SummaryView, load_charting, get_chart_backend
+from halo.settings import BASE, VERSION, DEFAULT_SCREEN_HEIGHT, DEFAULT_SCREEN_WIDTH, DISPLAY_TEMP_UNITS, \
+    RESIZE_INTERVAL, RESIZE_SETTLE
 
 gi.require_version("Gtk", "3.0")
 from gi.repository import Gtk, GdkPixbuf, Gdk, GObject, GLib  # noqa: E402
 
-rcParams['font.family'] = 'sans-serif'
-rcParams['font.sans-serif'] = ['Lato', 'DejaVu Sans']
-
 
 class MainWindow(Gtk.ApplicationWindow):
     def __init__(self, application):
@@ -30,17 +35,33 @@ class MainWindow(Gtk.ApplicationWindow):
         Initialises the main window
         """
         super().__init__(application=application)
-        self.api = OpenWeatherMap()
+        self.api = create_provider()
+        self.api.on_revalidated = self.on_revalidated
+        self._revalidate_pending = False
+        EventLoop.configure_dispatch(GLib.idle_add)
+        self.async_api = AsyncAPI(self.api, EventLoop.get_default())
+        self.scheduler = RefreshScheduler(AsyncAPI(create_provider(self.api.name, self.api.cache),
+                                                   EventLoop.get_default()),
+                                          self.on_scheduled_refresh)
+        self._refreshing = None
+        self._refreshing_city = None
+        self._generation = 0
         self.store = DataStore()
+        self.history = HistoryStore()
         self.city = None
         self.city_tz = "UTC"
+        self.city_tzinfo = pytz.utc
+        self._clock_text = {}
+        self._date_until = (None, 0)
         self.currentWeather = None
-        self.forecastWeather = []
-        self.chartData = []
-        self.historyWeather = []
-        self.historyChartData = []
+        self.forecastWeather = WeatherSeries()
+        self.historyWeather = WeatherSeries()
         self.LH = 0
         self.LW = 0
+        self._size = (0, 0)
+        self._resize_source = None
+        self._save_source = None
+        self.background = Background()
 
         # Background image
         self.overlay = Gtk.Overlay()
@@ -177,33 +198,78 @@ class MainWindow(Gtk.ApplicationWindow):
         self.set_default_size(DataStore.get_width(), DataStore.get_height())
         self.set_position(Gtk.WindowPosition.CENTER)
 
-        self.connect('size-allocate', lambda w, rect: GObject.idle_add(
-            self.win_resize, rect, priority=GLib.PRIORITY_HIGH))
+        self.connect('size-allocate', self.on_size_allocate)
         self.set_icon_from_file(BASE + "/assets/halo.svg")
+        if os.getenv("HALO_EXIT_AFTER_PAINT"):
+            # Used by benchmarks/startup.py to measure the time to first paint.
+            self.connect_after('draw', self.exit_after_paint)
         self.show_all()
+        self.render_last_weather()
+        if get_chart_backend() == 'matplotlib':
+            load_charting(self.enable_charts)
 
-        GObject.timeout_add_seconds(2, self.update_time)
+        self.tick_clock()
         GObject.idle_add(self.refresh)
+        GObject.idle_add(self.scheduler.start)
+        GObject.idle_add(Icon.prewarm, (50, 60), self.get_scale_factor(), priority=GLib.PRIORITY_LOW)
         stack_area.set_visible_child_name("forecast")
 
-    def win_resize(self, screen):
+    def render_last_weather(self):
+        """Shows the weather displayed last time until fresh data arrives."""
+        last = self.store.get_last_weather()
+        if last is not None and self.currentWeather is None:
+            city, self.city_tz, self.currentWeather = last
+            self.city_tzinfo = get_tzinfo(self.city_tz)
+            self.render_weather(city)
+
+    def enable_charts(self):
+        """Replaces the chart placeholders once matplotlib has loaded."""
+        self.forecastArea.enable_chart()
+        self.historyArea.enable_chart()
+        return False
+
+    def exit_after_paint(self, widget, cr):
+        """Reports the first paint of the window and quits."""
+        print("first-paint", flush=True)
+        GLib.idle_add(self.get_application().quit)
+        return False
+
+    def on_size_allocate(self, widget, rect):
         """
-        Resize the background image when window is resized
-        and store new screen size to db.
+        Collects resize events. The background follows the latest size at most
+        once every RESIZE_INTERVAL and the size is saved once resizing settles.
         """
-        if self.LW is not screen.width or self.LH is not screen.height:
-            self.bg.set_size_request(screen.width, screen.height)
-            buff = GdkPixbuf.Pixbuf.new_from_file(DataStore.get_bg_file())
-            buff = buff.scale_simple(screen.width, screen.height, GdkPixbuf.InterpType.BILINEAR)
-            self.bg.set_from_pixbuf(buff)
-
-            self.store.screen(screen.width, screen.height)
-            self.LW = screen.width
-            self.LH = screen.height
+        self._size = (rect.width, rect.height)
+        if self._resize_source is None:
+            self._resize_source = GLib.timeout_add(RESIZE_INTERVAL, self.win_resize, priority=GLib.PRIORITY_HIGH)
+        if self._save_source is not None:
+            GLib.source_remove(self._save_source)
+        self._save_source = GLib.timeout_add(RESIZE_SETTLE, self.save_screen)
+
+    def win_resize(self):
+        """
+        Resize the background image when window is resized.
+        """
+        self._resize_source = None
+        width, height = self._size
+        if self.LW != width or self.LH != height:
+            self.bg.set_size_request(width, height)
+            self.bg.set_from_pixbuf(self.background.scale(DataStore.get_bg_file(), width, height))
+            self.LW = width
+            self.LH = height
+        return False
+
+    def save_screen(self):
+        """
+        Store new screen size to db.
+        """
+        self._save_source = None
+        self.store.screen(*self._size)
+        return False
 
     def switch_city(self, widget=None):
         """Change the city for which weather data is displayed"""
-        dialog = PlaceDialog(self)
+        dialog = PlaceDialog(self, self.async_api)
         response = dialog.run()
 
         if response == Gtk.ResponseType.OK:
@@ -223,6 +289,7 @@ class MainWindow(Gtk.ApplicationWindow):
         self.LH = 0  # This will force redraw of background on window
         preference.save_preference()
         preference.destroy()
+        self.win_resize()
 
     def show_about(self, w):
         """
@@ -247,16 +314,26 @@ class MainWindow(Gtk.ApplicationWindow):
         about.run()
         about.destroy()
 
-    def fetch_weather(self, city=None, widget=None):
+    async def fetch_weather(self, city=None, widget=None, generation=None):
         """
         Fetch the weather data from online endpoints and update the ui.
+        Results are dropped once a newer refresh has started, so they are never applied out of order.
 
         :param city: City for which weather is fetched.
         :param widget: The GUI widget that triggered search.
+        :param generation: number of the refresh, defaults to the latest one.
         """
+        if generation is None:
+            generation = self._generation
+
+        def ensure_latest():
+            """Stops this refresh like a cancelled one when a newer refresh has started."""
+            if generation != self._generation:
+                raise asyncio.CancelledError()
+
         # If no city is specified, then detect location based on user ip.
         if city is None and not self.api.has_ip_support:
-            city = get_location()
+            city = await self.async_api.run(self.api.get_location)
 
         def not_found(err):
             """
@@ -295,51 +372,119 @@ class MainWindow(Gtk.ApplicationWindow):
             else:
                 exit(0)
 
+        pending = []
         try:
-            with concurrent.futures.ThreadPoolExecutor(max_workers=4) as exe:
-                # Current weather
-                current = exe.submit(self.api.get_current_weather, city)
-                # Forecast
-                forecast = exe.submit(self.api.get_forecast_weather, city)
-                self.city, self.city_tz, self.currentWeather = current.result()
-
-                # Historic data fetched with tz returned from previous call
-                if self.api.has_historical:
-                    history = exe.submit(self.api.get_weather_history, city, self.city_tz)
-                self.forecastWeather, self.chartData = forecast.result()
-                # Render current weather
-                GObject.idle_add(self.render_weather)
-                GObject.idle_add(self.forecastArea.render, self.forecastWeather, self.chartData)
-
-                # Render history data
-                if self.api.has_historical:
-                    self.historyWeather, self.historyChartData = history.result()
-                    GObject.idle_add(self.historyArea.render, self.historyWeather, self.historyChartData)
+            # Forecast
+            forecast = asyncio.ensure_future(self.async_api.get_forecast_weather(city))
+            pending.append(forecast)
+            # Current weather
+            current = await self.async_api.get_current_weather(city)
+            ensure_latest()
+            self.city, self.city_tz, self.currentWeather = current
+            self.city_tzinfo = get_tzinfo(self.city_tz)
+            self.store.set_last_weather(self.city, str(self.city_tz), self.currentWeather)
+            self.scheduler.set_active(self.city)
+
+            # Historic data fetched with tz returned from previous call
+            if self.api.has_historical:
+                history = asyncio.ensure_future(self.async_api.get_weather_history(city, self.city_tz))
+                pending.append(history)
+            forecast = await forecast
+            ensure_latest()
+            self.forecastWeather = forecast
+            # Render current weather
+            GObject.idle_add(self.render_weather)
+            GObject.idle_add(self.forecastArea.render, self.forecastWeather)
+
+            # Render history data, from the observations kept locally when the provider has none.
+            if self.api.has_historical:
+                history = await history
+            else:
+                history = await self.async_api.run(self.history.get_yesterday, self.city, str(self.city_tz))
+            ensure_latest()
+            self.historyWeather = history
+            if len(self.historyWeather) > 0:
+                GObject.idle_add(self.historyArea.render, self.historyWeather)
+            GObject.idle_add(self.clear_cursor, widget)
+        except asyncio.CancelledError:
+            # Superseded by a newer refresh which now owns the cursor.
+            if widget is not None:
+                GObject.idle_add(widget.set_sensitive, True)
+            raise
+        except APIError as e:
+            if generation != self._generation:
+                # Errors of a superseded refresh are of no interest anymore.
+                if widget is not None:
+                    GObject.idle_add(widget.set_sensitive, True)
+            elif isinstance(e, NotFound):
+                GObject.idle_add(not_found, e)
+            elif isinstance(e, RateLimitReached) and self.currentWeather is not None:
+                # Keep showing what we have, the next refresh will bring the rest.
                 GObject.idle_add(self.clear_cursor, widget)
-        except NotFound as e:
-            GObject.idle_add(not_found, e)
-        except (APIError, RateLimitReached) as e:
-            GObject.idle_add(api_error, e)
-
-    def render_weather(self):
+            else:
+                GObject.idle_add(api_error, e)
+        except asyncio.TimeoutError:
+            GObject.idle_add(api_error, APIError("The weather service took too long to respond. "
+                                                 "Please try again later."))
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def render_weather(self, city=None):
         """
         Update the current weather info of currently chosen city
+
+        :param city: City name shown, defaults to the chosen city.
         """
         if self.currentWeather is None:
             return
-        self.icon.set_from_pixbuf(Icon.get_icon(self.currentWeather['code'], 60))
-        self.place.set_text(self.city)
+        Icon.show(self.icon, self.currentWeather['code'], 60)
+        self.place.set_text(city if city is not None else self.city)
         self.status.set_text(self.currentWeather['status'].title())
         self.temperature.set_text(str(int(self.currentWeather['temp'])) + DISPLAY_TEMP_UNITS[DataStore.get_units()])
         self.update_time()
 
+    def on_revalidated(self, slug, query, units):
+        """
+        Re-render once stale cached data shown earlier has been refreshed in background.
+        Called from the revalidating thread, so bursts are merged into one refresh.
+        """
+        if not self._revalidate_pending:
+            self._revalidate_pending = True
+            GObject.timeout_add(250, self._refresh_revalidated)
+
+    def _refresh_revalidated(self):
+        self._revalidate_pending = False
+        self.refresh()
+        return False
+
+    def on_scheduled_refresh(self, city):
+        """
+        Re-render after the scheduler has refreshed the data of the city shown.
+        Called from the event loop, the refresh is then served from cache.
+        """
+        GObject.idle_add(self._refresh_scheduled, city)
+
+    def _refresh_scheduled(self, city):
+        if city == self.city:
+            self.refresh()
+        return False
+
     def refresh(self, widget=None):
         """Fetch the latest data into the ui"""
         if widget is not None:
             widget.set_sensitive(False)
         self.busy_cursor()
-        thread = threading.Thread(target=self.fetch_weather, args=(self.city, widget))
-        thread.start()
+        if self._refreshing is not None and not self._refreshing.done():
+            if self._refreshing_city == self.city:
+                # Join the refresh on its way instead of fetching the same data again.
+                if widget is not None:
+                    self.async_api.loop.add_done_callback(self._refreshing, lambda f: widget.set_sensitive(True))
+                return
+            self._refreshing.cancel()
+        self._generation += 1
+        self._refreshing_city = self.city
+        self._refreshing = self.async_api.submit(self.fetch_weather(self.city, widget, self._generation))
 
     # noinspection PyUnusedLocal
     def busy_cursor(self, w=None):
@@ -356,13 +501,31 @@ class MainWindow(Gtk.ApplicationWindow):
         if widget is not None:
             widget.set_sensitive(True)
 
+    def tick_clock(self):
+        """Updates the time shown and wakes up again right after the next minute starts."""
+        self.update_time()
+        GLib.timeout_add(int((60 - time.time() % 60) * 1000) + 50, self.tick_clock)
+        return False
+
     def update_time(self):
         """Updates the time shown as per the timezone of currently chosen city"""
-        dt = datetime.now(pytz.utc).astimezone(pytz.timezone(self.city_tz))
-        self.time.set_text(dt.strftime("%I:%M "))
-        self.t_follow.set_text(dt.strftime("%p"))
-        self.date.set_text(dt.strftime("%A, %d %B %Y"))
-        return True
+        now = time.time()
+        dt = datetime.fromtimestamp(now, self.city_tzinfo)
+        self.__set_clock_label(self.time, dt.strftime("%I:%M "))
+        self.__set_clock_label(self.t_follow, dt.strftime("%p"))
+
+        # The date only changes at local midnight or with the city.
+        tz, until = self._date_until
+        if tz is not self.city_tzinfo or now >= until:
+            self.__set_clock_label(self.date, dt.strftime("%A, %d %B %Y"))
+            midnight = datetime(dt.year, dt.month, dt.day) + timedelta(days=1)
+            self._date_until = (self.city_tzinfo, self.city_tzinfo.localize(midnight).timestamp())
+
+    def __set_clock_label(self, label, text):
+        """Sets the text of a label unless it's already shown, sparing a relayout."""
+        if self._clock_text.get(label) != text:
+            self._clock_text[label] = text
+            label.set_text(text)
 
 
 class Halo(Gtk.Application):
@@ -375,6 +538,12 @@ class Halo(Gtk.Application):
     def do_startup(self):
         Gtk.Application.do_startup(self)
 
+    def do_shutdown(self):
+        # The writers run on daemon threads, so whatever is still queued would be lost at exit.
+        for store in (DataStore(), HistoryStore(), CityIndex()):
+            store.close()
+        Gtk.Application.do_shutdown(self)
+
 
 if __name__ == '__main__':
     app = Halo()
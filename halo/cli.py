@@ -0,0 +1,168 @@
+"""
+Fetches weather data from the command line, without Gtk or matplotlib.
+
+Run as `halo-weather --headless [options] [city ...]`.
+"""
+
+import argparse
+import csv
+import json
+import sys
+import threading
+from typing import Any, Dict, List, Optional
+
+from halo import CityIndex
+from halo.API import API, APIError, create_provider
+from halo.AsyncAPI import AsyncAPI, EventLoop
+from halo.DataStore import DataStore
+from halo.History import HistoryStore
+from halo.Scheduler import RefreshScheduler
+from halo.Series import WeatherSeries
+from halo.Server import serve
+from halo.settings import DISPLAY_TEMP_UNITS, SERVER_HOST, SERVER_PORT
+
+FORECAST_FIELDS = ['dt', 'temp', 'humidity', 'pressure', 'wind', 'code']
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="halo-weather --headless",
+                                     description="Prints the weather of cities as JSON or CSV.")
+    parser.add_argument("cities", nargs="*",
+                        help="cities like London,GB. Defaults to the saved cities or else your location.")
+    parser.add_argument("-f", "--format", choices=("json", "csv"), default="json", help="output format")
+    parser.add_argument("--forecast", action="store_true", help="include the forecast of each city")
+    parser.add_argument("--provider", help="weather provider, defaults to the one chosen in settings")
+    parser.add_argument("--serve", action="store_true",
+                        help="serve weather over HTTP to other instances using the 'remote' provider")
+    parser.add_argument("--host", default=SERVER_HOST, help="address the server listens on")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="port the server listens on")
+    parser.add_argument("--daemon", action="store_true",
+                        help="keep running and refresh the cities in background, so later calls are served "
+                             "from cache")
+    parser.add_argument("--build-city-index", metavar="FILE",
+                        help="fill the city search index from the city list of openweathermap.org "
+                             "(city.list.json.gz)")
+    return parser.parse_args(argv)
+
+
+def fetch(api: API, cities: List[str], forecast: bool = False) -> List[Dict[str, Any]]:
+    """
+    Fetches the current weather and optionally the forecast of cities.
+
+    :param api: provider
+    :param cities: search queries
+    :param forecast: whether to fetch the forecast too
+    :return: a record per city, holding an 'error' instead of data if it couldn't be fetched.
+    """
+    current = api.get_current_weather_batch(cities)
+    forecasts = api.get_forecast_weather_batch(cities) if forecast else {}
+    units = DISPLAY_TEMP_UNITS[DataStore.get_units()]
+    records = []
+    for query in cities:
+        result = current[query]
+        if isinstance(result, APIError):
+            records.append({'query': query, 'error': str(result)})
+            continue
+        city, city_tz, weather = result
+        record = {'query': query, 'city': city, 'timezone': str(city_tz), 'status': weather['status'],
+                  'code': weather['code'], 'temp': weather['temp'], 'units': units}
+        if forecast:
+            series = forecasts[query]
+            if isinstance(series, APIError):
+                record['error'] = str(series)
+            else:
+                record['forecast'] = series_records(series)
+        records.append(record)
+    return records
+
+
+def series_records(series: WeatherSeries) -> List[Dict[str, Any]]:
+    return [{field: getattr(point, field) for field in FORECAST_FIELDS} for point in series]
+
+
+def write(records: List[Dict[str, Any]], output_format: str, out=sys.stdout):
+    """
+    Prints records as a JSON list or as CSV, with a row per forecast point if forecasts were fetched.
+
+    :param records: records of :func:`fetch`
+    :param output_format: 'json' or 'csv'
+    :param out: stream written to
+    """
+    if output_format == "json":
+        json.dump(records, out, ensure_ascii=False)
+        out.write("\n")
+        return
+    if any('forecast' in record for record in records):
+        writer = csv.DictWriter(out, ['query', 'city'] + FORECAST_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for record in records:
+            for point in record.get('forecast', []):
+                writer.writerow(dict(point, query=record['query'], city=record['city']))
+    else:
+        writer = csv.DictWriter(out, ['query', 'city', 'timezone', 'status', 'code', 'temp', 'units', 'error'],
+                                extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def default_cities(api: API) -> List[str]:
+    cities = ["{},{}".format(name, str(country).upper()) for name, country in DataStore().get_cities()]
+    return cities if cities else [api.get_location()]
+
+
+def run_daemon(api: API, cities: List[str], stop: Optional[threading.Event] = None):
+    """
+    Keeps the data of cities warm in the cache until interrupted.
+
+    :param api: provider of the first fetch, whose cache is shared with the scheduler
+    :param cities: search queries, the first one is refreshed most often.
+    :param stop: event ending the daemon, defaults to running until interrupted.
+    """
+    scheduler = RefreshScheduler(AsyncAPI(create_provider(api.name, api.cache), EventLoop.get_default()))
+    scheduler.set_active(cities[0])
+    scheduler.start()
+    try:
+        (stop or threading.Event()).wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.stop()
+        DataStore().flush()
+
+
+def close_stores():
+    """Writes out what the stores still have queued, as their writer threads don't outlive the process."""
+    for store in (DataStore(), HistoryStore(), CityIndex.CityIndex()):
+        store.close()
+
+
+def main(argv: List[str] = None) -> int:
+    """
+    Runs the command line.
+
+    :param argv: arguments without the program name and --headless
+    :return: exit status, 1 if the data of any city couldn't be fetched.
+    """
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    try:
+        if args.build_city_index:
+            count, size = CityIndex.build(args.build_city_index)
+            print("Read %d cities, the index has %d." % (count, size))
+            return 0
+        api = create_provider(args.provider)
+        if args.serve:
+            serve(api, args.host, args.port)
+            return 0
+        cities = args.cities or default_cities(api)
+        records = fetch(api, cities, args.forecast)
+        write(records, args.format)
+        sys.stdout.flush()
+        if args.daemon:
+            run_daemon(api, cities)
+        return 1 if any('error' in record for record in records) else 0
+    finally:
+        close_stores()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
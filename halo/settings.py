@@ -16,10 +16,85 @@ os.makedirs(APP_DATA, exist_ok=True)  # Make the directory if it doesn't exists
 
 DEFAULT_BACKGROUND_IMAGE = BASE + '/assets/bg.jpg'
 DEFAULT_DB_LOCATION = APP_DATA + "/database.sqlite"
+DEFAULT_CACHE_LOCATION = APP_DATA + "/cache.sqlite"
+DEFAULT_HISTORY_LOCATION = APP_DATA + "/history.sqlite"
+# Cities searched while typing. The index bundled with the package, if any, is copied on first use.
+DEFAULT_CITY_INDEX_LOCATION = APP_DATA + "/cities.sqlite"
+BUNDLED_CITY_INDEX = BASE + "/assets/cities.sqlite"
+# Milliseconds of pause in typing before the cities are searched.
+CITY_SEARCH_DELAY = 150
+
+# Trend charts are drawn with 'cairo', or with 'matplotlib' when it's installed.
+CHART_BACKEND = 'cairo'
+
+# Maximum number of rendered weather icons kept in memory.
+ICON_CACHE_SIZE = 64
+
+# Seconds sqlite waits on a locked database, then the number of retries starting at the given delay.
+DB_BUSY_TIMEOUT = 2
+DB_RETRIES = 4
+DB_RETRY_DELAY = 0.05
 
 DEFAULT_SCREEN_WIDTH = 700
 DEFAULT_SCREEN_HEIGHT = 570
+# Milliseconds between background rescales while resizing and before the window size is saved.
+RESIZE_INTERVAL = 30
+RESIZE_SETTLE = 500
 
 SUPPORTED_UNITS = {'Metric': 'M', 'Scientific': 'S', 'Fahrenheit': 'I'}
 DISPLAY_TEMP_UNITS = {'M': '°C', 'S': 'K', 'I': '°F'}
 DEFAULT_UNITS = 'M'
+
+# Weather provider used unless another one is chosen in the settings of the database.
+DEFAULT_PROVIDER = 'openweathermap'
+# Responses captured by the 'record' provider and served by the 'replay' provider, with the seconds each
+# replayed request takes, the share of them failing as if the service was down and the location reported.
+REPLAY_DIRECTORY = APP_DATA + "/captures"
+REPLAY_LATENCY = 0.0
+REPLAY_ERROR_RATE = 0.0
+REPLAY_LOCATION = 'London,GB'
+# Address the server mode listens on and the server used by the 'remote' provider.
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8642
+REMOTE_URL = 'http://127.0.0.1:8642'
+
+HTTP_POOL_SIZE = 10
+HTTP_CONNECT_TIMEOUT = 3.05
+HTTP_READ_TIMEOUT = 15
+# Retries of a failed request, the delay before the first one in seconds, the longest delay and
+# the seconds after which no further retry is started, keeping a fetch within REQUEST_TIMEOUT.
+HTTP_RETRIES = 2
+HTTP_RETRY_DELAY = 0.5
+HTTP_RETRY_MAX_DELAY = 4
+HTTP_RETRY_DEADLINE = 10
+# Consecutive failures after which requests aren't sent for the given seconds and cached data is served instead.
+CIRCUIT_FAILURES = 5
+CIRCUIT_RESET = 60
+# Worker threads used for blocking calls of the event loop and the overall timeout of each call.
+IO_WORKERS = 4
+REQUEST_TIMEOUT = 30
+# Parse forecast and history responses incrementally while they are downloaded, in chunks of the given bytes.
+STREAMING_PARSE = False
+STREAM_CHUNK_SIZE = 16 * 1024
+# Maximum concurrent requests when a provider can't fetch many cities at once.
+BATCH_WORKERS = 4
+# Requests this client may send with the api key per minute and per day, and the share of either
+# below which cached responses of any age are served instead of being refreshed.
+RATE_LIMIT_PER_MINUTE = 60
+RATE_LIMIT_PER_DAY = 1000
+RATE_LIMIT_RESERVE = 0.2
+
+# Seconds for which a cached response of each endpoint is considered fresh.
+CACHE_TTL = {'weather': 10 * 60, 'group': 10 * 60, 'forecast': 60 * 60, 'history': 3 * 60 * 60}
+# Seconds for which a stale response may still be shown while it's being refreshed.
+CACHE_STALE_TTL = 24 * 60 * 60
+
+# Days for which every observation is kept before it's averaged into hourly points, and days until it's dropped.
+HISTORY_RAW_DAYS = 2
+HISTORY_RETENTION_DAYS = 5 * 365
+# Seconds between compactions of the history by long running processes.
+HISTORY_COMPACT_INTERVAL = 6 * 60 * 60
+
+# Seconds after start before saved cities are refreshed in background and the longest backoff after failures.
+SCHEDULE_SAVED_DELAY = 60
+SCHEDULE_MAX_BACKOFF = 6 * 60 * 60
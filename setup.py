@@ -33,9 +33,12 @@ setup(name='halo-weather',
           "requests",
           "pytz",
           "pygobject",
-          "matplotlib",
+          "pycairo",
           "typing"
       ],
+      extras_require={
+          "matplotlib": ["matplotlib"],
+      },
       data_files=[
           (os.getenv('HOME') + '/.local/share/applications', ['halo.desktop']),
           (os.getenv('HOME') + '/.local/share/icons', ['halo/assets/halo.svg']),
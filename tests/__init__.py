@@ -0,0 +1,27 @@
+"""
+The tests run with a temporary HOME, so they never read or write the data of the user
+and every run starts from empty databases. This runs before halo.settings is imported.
+"""
+
+import os
+import tempfile
+
+os.environ['HOME'] = tempfile.mkdtemp(prefix='halo-tests-')
+
+TEST_DB = os.path.join(os.environ['HOME'], 'test.sqlite')
+
+
+def reset_stores():
+    """Starts over from empty databases, so a test doesn't depend on what earlier tests stored."""
+    from halo.CityIndex import CityIndex
+    from halo.DataStore import DataStore
+    from halo.History import HistoryStore
+    from halo.settings import DEFAULT_DB_LOCATION, DEFAULT_HISTORY_LOCATION, DEFAULT_CITY_INDEX_LOCATION
+
+    for store in (DataStore(), HistoryStore(), CityIndex()):
+        store.close()
+    for location in (DEFAULT_DB_LOCATION, DEFAULT_HISTORY_LOCATION, DEFAULT_CITY_INDEX_LOCATION):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(location + suffix):
+                os.remove(location + suffix)
+    DataStore()  # Publishes the default settings again.
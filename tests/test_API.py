@@ -1,7 +1,17 @@
 import json
+import tempfile
+import threading
+import time
 from unittest import TestCase, mock, main
+from urllib.parse import unquote
 
-from halo.API import OpenWeatherMap, NotFound, APIError, RateLimitReached
+from halo.API import API, OpenWeatherMap, NotFound, APIError, RateLimitReached, ServiceUnavailable, \
+    ReplayProvider, RecordProvider, create_provider, get_location
+from halo.Cache import ResponseCache
+from halo.DataStore import DataStore
+from halo.RateLimit import RequestBudget
+from halo.Retry import RetryPolicy, CircuitBreaker
+from tests import TEST_DB, reset_stores
 
 current = json.loads("""
 {"coord":{"lon":-0.13,"lat":51.51},"weather":[{"id":300,"main":"Drizzle","description":"light intensity drizzle","icon":"09d"}],"base":"stations","main":{"temp":280.32,"pressure":1012,"humidity":81,"temp_min":279.15,"temp_max":281.15},"visibility":10000,"wind":{"speed":4.1,"deg":80},"clouds":{"all":90},"dt":1485789600,"sys":{"type":1,"id":5091,"message":0.0103,"country":"GB","sunrise":1485762037,"sunset":1485794875},"id":2643743,"name":"London","cod":200}
@@ -16,6 +26,15 @@ history_daily_data = json.loads("""
 MOCK_DATA = None
 
 
+def fresh_budget(per_minute=60, per_day=1000, reserve=0.2) -> RequestBudget:
+    """Gives the providers a budget with nothing spent, so tests don't depend on earlier runs."""
+    store = DataStore(TEST_DB)
+    store.set_request_usage('', 0)
+    budget = RequestBudget(per_minute, per_day, reserve, store=store)
+    API.configure_budget(budget)
+    return budget
+
+
 def mock_request(*args, **kwargs):
     class FakeResponse:
         def __init__(self, status, response):
@@ -25,11 +44,23 @@ def mock_request(*args, **kwargs):
         def json(self):
             return self.response
 
-    if "ip=0.0.0.1" in args[0]:
+        def iter_content(self, chunk_size=1):
+            body = json.dumps(self.response).encode()
+            for i in range(0, len(body), chunk_size):
+                yield body[i:i + chunk_size]
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            pass
+
+    url = unquote(args[0])
+    if "ip=0.0.0.1" in url:
         return FakeResponse(204, MOCK_DATA)
-    elif "ip=0.0.0.2" in args[0]:
+    elif "ip=0.0.0.2" in url:
         return FakeResponse(500, MOCK_DATA)
-    elif "ip=0.0.0.3" in args[0]:
+    elif "ip=0.0.0.3" in url:
         return FakeResponse(429, MOCK_DATA)
     return FakeResponse(200, MOCK_DATA)
 
@@ -40,7 +71,11 @@ class TestAPI(TestCase):
     """
     def setUp(self):
         TestCase.setUp(self)
-        self.api = OpenWeatherMap()
+        reset_stores()
+        self.api = OpenWeatherMap(ResponseCache(':memory:'))
+        self.api.retry = RetryPolicy(retry_on=(ServiceUnavailable,), sleep=lambda delay: None)
+        API.configure_circuit(CircuitBreaker())
+        fresh_budget()
 
     def errors_check(self, fn, *args):
         """Just a wrapper to be reused for error checking."""
@@ -50,8 +85,10 @@ class TestAPI(TestCase):
             fn("ip=0.0.0.2", *args)
         with self.assertRaises(RateLimitReached):
             fn("ip=0.0.0.3", *args)
+        # The rate limit reported above has spent the budget of this minute.
+        fresh_budget()
 
-    @mock.patch('requests.get', side_effect=mock_request)
+    @mock.patch('requests.Session.get', side_effect=mock_request)
     def test_get_current_weather(self, mock_get):
         global MOCK_DATA
         MOCK_DATA = current
@@ -59,12 +96,12 @@ class TestAPI(TestCase):
 
         city, city_tz, current_weather = self.api.get_current_weather("ip=auto")
         self.assertIsNotNone(city, "Invalid city.")
-        self.assertIsNotNone(city_tz, "Invalid timezone.")
+        self.assertEqual(city_tz, "Europe/London", "Invalid timezone.")
         self.assertDictEqual({
             'status': 'Drizzle', 'code': 300, 'temp': 280.32
         }, current_weather, "Invalid current weather data.")
 
-    @mock.patch('requests.get', side_effect=mock_request)
+    @mock.patch('requests.Session.get', side_effect=mock_request)
     def test_get_forecast_weather(self, mock_get):
         global MOCK_DATA
         MOCK_DATA = forecast_data
@@ -72,8 +109,26 @@ class TestAPI(TestCase):
 
         forecast_weather = self.api.get_forecast_weather("ip=auto")
         self.assertIsNotNone(forecast_weather, "Invalid forecast data.")
+        self.assertEqual(len(forecast_weather), 40)
+        self.assertEqual(forecast_weather.temp[0], 33.1)
+        self.assertEqual(forecast_weather.code[0], 500)
 
-    @mock.patch('requests.get', side_effect=mock_request)
+    @mock.patch('requests.Session.get', side_effect=mock_request)
+    @mock.patch('halo.API.STREAM_CHUNK_SIZE', 100)
+    def test_streaming_forecast(self, mock_get):
+        """The streaming parser must produce the same series as the full one."""
+        global MOCK_DATA
+        MOCK_DATA = forecast_data
+        self.api.streaming = True
+        self.errors_check(self.api.get_forecast_weather)
+
+        streamed = self.api.get_forecast_weather("ip=auto")
+        self.assertEqual(list(streamed), list(OpenWeatherMap(ResponseCache(':memory:'))
+                                              .get_forecast_weather("ip=auto")))
+        self.assertEqual(list(self.api.get_forecast_weather("ip=auto")), list(streamed),
+                         "Streamed response was not cached.")
+
+    @mock.patch('requests.Session.get', side_effect=mock_request)
     def test_get_weather_history(self, mock_get):
         global MOCK_DATA
         MOCK_DATA = history_daily_data
@@ -82,6 +137,159 @@ class TestAPI(TestCase):
         history_weather = self.api.get_weather_history("ip=auto", "America/New_York")
         self.assertIsNotNone(history_weather, "Invalid history data.")
 
+    def test_get_location(self):
+        """A city must be returned even when the location service answers with something unexpected."""
+        global MOCK_DATA
+        for MOCK_DATA in ({"error": True}, None, []):
+            with mock.patch('requests.Session.get', side_effect=mock_request):
+                self.assertEqual(get_location(), 'Kochi,IN')
+
+    def test_shared_session(self):
+        """Every provider must reuse the same pooled session."""
+        self.assertIs(self.api.get_session(), OpenWeatherMap(self.api.cache).get_session())
+
+    @mock.patch('requests.Session.get', side_effect=mock_request)
+    def test_cached_request(self, mock_get):
+        """A fresh response must be served from cache without hitting the network."""
+        global MOCK_DATA
+        MOCK_DATA = current
+        self.api.get_current_weather("ip=auto")
+        self.api.get_current_weather("ip=auto")
+        self.assertEqual(mock_get.call_count, 1)
+
+    @mock.patch('requests.Session.get', side_effect=mock_request)
+    def test_cached_observation(self, mock_get):
+        """An observation served again from cache must not be written again."""
+        global MOCK_DATA
+        MOCK_DATA = current
+        with mock.patch('halo.API.HistoryStore.record') as record:
+            self.api.get_current_weather("ip=auto")
+            self.api.get_current_weather("ip=auto")
+        self.assertEqual(record.call_count, 1)
+
+    @mock.patch('requests.Session.get', side_effect=mock_request)
+    def test_get_current_weather_batch(self, mock_get):
+        """Cities with a known id must be fetched together from the group endpoint."""
+        global MOCK_DATA
+        MOCK_DATA = current
+        self.api.get_current_weather("London,GB")
+
+        MOCK_DATA = {"cnt": 1, "list": [current]}
+        mock_get.reset_mock()
+        results = self.api.get_current_weather_batch(["London,GB", "London, GB"])
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertIn("/group?id=2643743", mock_get.call_args[0][0])
+        self.assertEqual(results["London,GB"][2]['code'], 300)
+
+    @mock.patch('requests.Session.get', side_effect=mock_request)
+    def test_budget(self, mock_get):
+        """Once the budget is low cached data of any age is served and nothing is sent when it's spent."""
+        global MOCK_DATA
+        MOCK_DATA = current
+        fresh_budget(per_minute=2, reserve=0.6)
+        self.api.get_current_weather("London,GB")
+        # Cached under the query the next call sends, by id now that London is known.
+        self.api.cache.put(*self.api._cache_key("weather", self.api._query("London,GB")), current)
+        with mock.patch('time.time', return_value=time.time() + 2 * 24 * 60 * 60):
+            self.api.get_current_weather("London,GB")
+        self.assertEqual(mock_get.call_count, 1)
+        self.api.get_current_weather("Paris,FR")
+        with self.assertRaises(RateLimitReached):
+            self.api.get_current_weather("Kochi,IN")
+        self.assertEqual(mock_get.call_count, 2)
+
+    def test_in_flight(self):
+        """Identical requests made at the same time must be sent once."""
+        global MOCK_DATA
+        MOCK_DATA = current
+
+        def slow_request(*args, **kwargs):
+            time.sleep(0.1)
+            return mock_request(*args, **kwargs)
+
+        with mock.patch('requests.Session.get', side_effect=slow_request) as mock_get:
+            threads = [threading.Thread(target=OpenWeatherMap(ResponseCache(':memory:')).get_current_weather,
+                                        args=("London,GB",)) for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(mock_get.call_count, 1)
+
+    def test_retry(self):
+        """A request failing on the side of the service must be retried."""
+        global MOCK_DATA
+        MOCK_DATA = current
+        responses = [mock_request("ip=0.0.0.2"), mock_request("")]
+        with mock.patch('requests.Session.get', side_effect=lambda *args, **kwargs: responses.pop(0)) as mock_get:
+            self.assertEqual(self.api.get_current_weather("London,GB")[2]['code'], 300)
+        self.assertEqual(mock_get.call_count, 2)
+
+    @mock.patch('requests.Session.get', side_effect=mock_request)
+    def test_circuit(self, mock_get):
+        """Old cached data must be served while the service is down, without sending requests."""
+        global MOCK_DATA
+        MOCK_DATA = current
+        API.configure_circuit(CircuitBreaker(failures=1))
+        self.api.stale_while_revalidate = False
+        self.api.cache.put(*self.api._cache_key("weather", "q=ip=0.0.0.2"), current)
+        with mock.patch('time.time', return_value=time.time() + 2 * 24 * 60 * 60):
+            self.assertEqual(self.api.get_current_weather("ip=0.0.0.2")[2]['code'], 300)
+            self.assertEqual(mock_get.call_count, self.api.retry.retries + 1)
+            self.assertEqual(self.api.get_current_weather("ip=0.0.0.2")[2]['code'], 300)
+            with self.assertRaises(ServiceUnavailable):
+                self.api.get_current_weather("London,GB")
+        self.assertEqual(mock_get.call_count, self.api.retry.retries + 1)
+
+    @mock.patch('requests.Session.get', side_effect=mock_request)
+    def test_circuit_probe(self, mock_get):
+        """The probe of a half-open circuit must be settled however the call ends."""
+        global MOCK_DATA
+        MOCK_DATA = forecast_data
+        now = [0.0]
+        circuit = CircuitBreaker(failures=1, reset_timeout=10, clock=lambda: now[0])
+        API.configure_circuit(circuit)
+        circuit.record_failure()
+        now[0] = 10
+
+        fresh_budget(per_minute=0)
+        with self.assertRaises(RateLimitReached):
+            self.api.get_forecast_weather("London,GB")
+        self.assertEqual(circuit.state, CircuitBreaker.OPEN, "No probe may be taken without budget.")
+
+        fresh_budget()
+        stream = self.api._cached_stream("forecast", "q=London,GB")
+        next(stream)
+        stream.close()
+        self.assertEqual(circuit.state, CircuitBreaker.CLOSED)
+
+    def test_registry(self):
+        """Providers are created by their registered name, falling back to the default one."""
+        self.assertIsInstance(create_provider('openweathermap', self.api.cache), OpenWeatherMap)
+        self.assertIsInstance(create_provider('replay', self.api.cache), ReplayProvider)
+        self.assertIs(type(create_provider('unknown', self.api.cache)), OpenWeatherMap)
+
+    @mock.patch('requests.Session.get', side_effect=mock_request)
+    def test_record_replay(self, mock_get):
+        """Captured responses are replayed offline, with errors injected if asked."""
+        global MOCK_DATA
+        MOCK_DATA = forecast_data
+        with tempfile.TemporaryDirectory() as directory:
+            recorder = RecordProvider(ResponseCache(':memory:'))
+            recorder.directory = directory
+            recorded = recorder.get_forecast_weather("London,GB")
+
+            replay = ReplayProvider(ResponseCache(':memory:'), directory)
+            self.assertEqual(list(replay.get_forecast_weather("London,GB")), list(recorded))
+            self.assertEqual(mock_get.call_count, 1)
+            with self.assertRaises(NotFound):
+                replay.get_forecast_weather("Paris,FR")
+
+            failing = ReplayProvider(ResponseCache(':memory:'), directory, error_rate=1)
+            failing.retry = self.api.retry
+            with self.assertRaises(ServiceUnavailable):
+                failing.get_forecast_weather("London,GB")
+
 
 if __name__ == '__main__':
     main()
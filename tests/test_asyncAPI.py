@@ -0,0 +1,61 @@
+import asyncio
+import time
+from unittest import TestCase, mock, main
+
+from halo.API import OpenWeatherMap, NotFound
+from halo.AsyncAPI import AsyncAPI, EventLoop
+from halo.Cache import ResponseCache
+from tests import test_API
+
+
+class TestAsyncAPI(TestCase):
+    """Tests for :class:`AsyncAPI` and the shared :class:`EventLoop`."""
+    def setUp(self):
+        TestCase.setUp(self)
+        self.api = AsyncAPI(OpenWeatherMap(ResponseCache(':memory:')), EventLoop.get_default())
+        test_API.fresh_budget()
+
+    @mock.patch('requests.Session.get', side_effect=test_API.mock_request)
+    def test_get_current_weather(self, mock_get):
+        test_API.MOCK_DATA = test_API.current
+        city, city_tz, current_weather = self.api.submit(self.api.get_current_weather("ip=auto")).result(5)
+        self.assertEqual(current_weather['code'], 300)
+        with self.assertRaises(NotFound):
+            self.api.submit(self.api.get_current_weather("ip=0.0.0.1")).result(5)
+
+    def test_timeout(self):
+        self.api.timeout = 0.01
+
+        def stall():
+            time.sleep(0.2)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            self.api.submit(self.api.run(stall)).result(5)
+
+    def test_done_callback(self):
+        async def answer():
+            return 42
+
+        results = []
+        self.api.submit(answer(), lambda f: results.append(f.result())).result(5)
+        self.api.submit(asyncio.sleep(0)).result(5)
+        self.assertEqual(results, [42])
+
+    def test_dispatch(self):
+        async def answer():
+            return 42
+
+        loop = EventLoop(dispatch=lambda fn, *args: dispatched.append((fn, args)))
+        dispatched = []
+        try:
+            loop.submit(answer(), print).result(5)
+            loop.submit(asyncio.sleep(0)).result(5)
+        finally:
+            loop.stop()
+        self.assertEqual(len(dispatched), 1)
+        self.assertIs(dispatched[0][0], print)
+        self.assertEqual(dispatched[0][1][0].result(), 42)
+
+
+if __name__ == "__main__":
+    main()
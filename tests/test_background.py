@@ -0,0 +1,27 @@
+from unittest import TestCase, main
+
+from halo.Background import Background
+from halo.settings import DEFAULT_BACKGROUND_IMAGE
+
+
+class TestBackground(TestCase):
+    """Tests for :class:`Background`."""
+    def setUp(self):
+        TestCase.setUp(self)
+        self.background = Background()
+
+    def test_scale(self):
+        buff = self.background.scale(DEFAULT_BACKGROUND_IMAGE, 120, 80)
+        self.assertEqual((buff.get_width(), buff.get_height()), (120, 80))
+
+    def test_level(self):
+        self.background.scale(DEFAULT_BACKGROUND_IMAGE, 10, 10)
+        level = self.background.get_level(10, 10)
+        self.assertGreaterEqual(level.get_width(), 10)
+        self.assertGreaterEqual(level.get_height(), 10)
+        self.assertTrue(level.get_width() < 20 or level.get_height() < 20,
+                        "A smaller mip level would still cover the window.")
+
+
+if __name__ == "__main__":
+    main()
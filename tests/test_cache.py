@@ -0,0 +1,27 @@
+from unittest import TestCase, main
+
+from halo.Cache import ResponseCache
+
+
+class TestResponseCache(TestCase):
+    """Tests for :class:`ResponseCache`."""
+    def setUp(self):
+        TestCase.setUp(self)
+        self.cache = ResponseCache(':memory:')
+
+    def test_rw(self):
+        self.assertIsNone(self.cache.get("weather", "q=London", "M"))
+        self.cache.put("weather", "q=London", "M", {"temp": 10})
+        data, age = self.cache.get("weather", "q=London", "M")
+        self.assertDictEqual(data, {"temp": 10})
+        self.assertGreaterEqual(age, 0)
+        self.assertIsNone(self.cache.get("weather", "q=London", "I"), "Units must be part of the key.")
+
+    def test_clear(self):
+        self.cache.put("forecast", "q=London", "M", [1, 2])
+        self.cache.clear()
+        self.assertIsNone(self.cache.get("forecast", "q=London", "M"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+from unittest import TestCase, main
+
+from halo.CityIndex import CityIndex, City, normalize, edit_distance, label, build
+
+cities = [
+    City("London", "GB", 51.5085, -0.1257, 2643743),
+    City("London", "CA", 42.9834, -81.233, 6058560),
+    City("Londonderry County Borough", "GB", 54.9966, -7.3086, 2643734),
+    City("Los Angeles", "US", 34.0522, -118.2437, 5368361),
+    City("São Paulo", "BR", -23.5475, -46.6361, 3448439),
+    City("Zürich", "CH", 47.3667, 8.55, 2657896),
+]
+
+
+class TestCityIndex(TestCase):
+    """Tests the offline city search."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.index = CityIndex(os.path.join(self.directory, 'cities.sqlite'))
+        self.index.add_many(cities)
+
+    def test_normalize(self):
+        self.assertEqual(normalize("  São   Paulo "), "sao paulo")
+        self.assertEqual(edit_distance("londno", "london"), 2)
+        self.assertEqual(label(cities[0]), "London,GB")
+
+    def test_prefix(self):
+        self.assertEqual([c.id for c in self.index.search("lond")], [6058560, 2643743, 2643734])
+        self.assertEqual([c.id for c in self.index.search("london, gb")], [2643743, 2643734])
+        self.assertEqual(self.index.search("lond", 1), [cities[1]])
+        self.assertEqual(self.index.search("zuri")[0].name, "Zürich")
+        self.assertEqual(self.index.search("SAO P")[0].id, 3448439)
+        self.assertEqual(self.index.search(""), [])
+
+    def test_typo(self):
+        self.assertEqual([c.id for c in self.index.search("Lomdon,GB")], [2643743, 2643734])
+        self.assertEqual(self.index.search("Kondon"), [], "Typos are looked for after the first letter.")
+        self.assertEqual([c.id for c in self.index.search("Lonfon,GB")], [2643743, 2643734])
+        self.assertEqual(self.index.search("Los Angels")[0].id, 5368361)
+        self.assertEqual(self.index.search("lnd"), [])
+
+    def test_add(self):
+        self.index.add("Paris", "fr", 48.8534, 2.3488, 2988507)
+        self.index.add("Paris", "FR", 48.8534, 2.3488, 2988507)
+        self.index.add("Nowhere", "FR")
+        self.index.flush()
+        self.assertEqual(self.index.search("pari"), [City("Paris", "FR", 48.8534, 2.3488, 2988507)])
+        self.assertEqual(self.index.search("nowhere"), [])
+        self.assertEqual(len(self.index), len(cities) + 1)
+
+    def test_upgrade(self):
+        """An index made before trigrams were kept gets them when it's opened."""
+        db_location = os.path.join(self.directory, 'old.sqlite')
+        conn = sqlite3.connect(db_location)
+        conn.execute('''CREATE TABLE city(key text, country text, id integer, name text, lat real, lon real,
+        PRIMARY KEY(key, country, id)) WITHOUT ROWID''')
+        conn.execute('''INSERT INTO city VALUES ('london', 'GB', 2643743, 'London', 51.5085, -0.1257)''')
+        conn.commit()
+        conn.close()
+        self.assertEqual(CityIndex(db_location).search("Lobdon"), [cities[0]])
+
+    def test_build(self):
+        file_name = os.path.join(self.directory, 'city.list.json.gz')
+        with gzip.open(file_name, 'wt', encoding='utf-8') as f:
+            json.dump([{"id": c.id, "name": c.name, "state": "", "country": c.country,
+                        "coord": {"lon": c.lon, "lat": c.lat}} for c in cities], f)
+        db_location = os.path.join(self.directory, 'built.sqlite')
+        self.assertEqual(build(file_name, db_location), (len(cities), len(cities)))
+        self.assertEqual(CityIndex(db_location).search("São"), [cities[4]])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import io
+import json
+import subprocess
+import sys
+import threading
+from unittest import TestCase, mock, main
+
+from halo import cli
+from halo.API import OpenWeatherMap, API
+from halo.Cache import ResponseCache
+from halo.Retry import CircuitBreaker
+from tests import test_API, reset_stores
+
+
+class TestCli(TestCase):
+    """Tests for the headless command line."""
+    def setUp(self):
+        TestCase.setUp(self)
+        reset_stores()
+        self.api = OpenWeatherMap(ResponseCache(':memory:'))
+        API.configure_circuit(CircuitBreaker())
+        test_API.fresh_budget()
+
+    @mock.patch('requests.Session.get', side_effect=test_API.mock_request)
+    def test_fetch(self, mock_get):
+        test_API.MOCK_DATA = test_API.current
+        records = cli.fetch(self.api, ["London,GB", "ip=0.0.0.1"])
+        self.assertEqual(records[0]['code'], 300)
+        self.assertIn('error', records[1])
+
+        out = io.StringIO()
+        cli.write(records, "json", out)
+        self.assertEqual(json.loads(out.getvalue())[0]['city'], records[0]['city'])
+        out = io.StringIO()
+        cli.write(records, "csv", out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], "query,city,timezone,status,code,temp,units,error")
+        self.assertEqual(len(lines), 3)
+
+    @mock.patch('requests.Session.get', side_effect=test_API.mock_request)
+    def test_forecast_csv(self, mock_get):
+        test_API.MOCK_DATA = test_API.forecast_data
+        records = [{'query': "Thrissur,IN", 'city': "Thrissur, IN",
+                    'forecast': cli.series_records(self.api.get_forecast_weather("Thrissur,IN"))}]
+        out = io.StringIO()
+        cli.write(records, "csv", out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], "query,city,dt,temp,humidity,pressure,wind,code")
+        self.assertEqual(len(lines), 41)
+
+    def test_daemon(self):
+        stop = threading.Event()
+        stop.set()
+        cli.run_daemon(self.api, ["London,GB"], stop)
+
+    def test_no_gui_imports(self):
+        """The command line must not load Gtk or matplotlib."""
+        code = "import sys, halo.cli; print(any(m.split('.')[0] in ('gi', 'matplotlib') for m in sys.modules))"
+        output = subprocess.check_output([sys.executable, "-c", code], universal_newlines=True)
+        self.assertEqual(output.strip(), "False")
+
+
+if __name__ == "__main__":
+    main()
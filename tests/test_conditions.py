@@ -0,0 +1,30 @@
+from unittest import TestCase, main
+
+from halo import Conditions
+
+
+class TestConditions(TestCase):
+    """Tests the weather condition lookup tables."""
+
+    def test_icon_name(self):
+        self.assertEqual(Conditions.get_icon_name(201), "wi-thunderstorm")
+        self.assertEqual(Conditions.get_icon_name("731"), "wi-dust")
+        self.assertEqual(Conditions.get_icon_name(741), "wi-fog")
+        self.assertEqual(Conditions.get_icon_name(900), "wi-rain")
+        self.assertEqual(Conditions.get_icon_name(804), Conditions.DEFAULT_ICON)
+        self.assertEqual(Conditions.get_icon_name(999), Conditions.DEFAULT_ICON)
+
+    def test_provider(self):
+        day = Conditions.get_condition('openweathermap', '10d')
+        night = Conditions.get_condition('openweathermap', '10n')
+        self.assertEqual((day.code, day.icon, day.day), (500, "wi-rain", True))
+        self.assertEqual((night.code, night.day), (500, False))
+        self.assertIsNone(Conditions.get_condition('openweathermap', '99d'))
+
+    def test_register_provider(self):
+        Conditions.register_provider('test', {'sun': (800, True)})
+        self.assertEqual(Conditions.get_condition('test', 'sun').label, "Clear")
+
+
+if __name__ == "__main__":
+    main()
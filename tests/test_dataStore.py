@@ -1,14 +1,15 @@
 import os
-from unittest import TestCase, main
+from unittest import TestCase, mock, main
 
-from halo.DataStore import DataStore
+from halo.DataStore import DataStore, Writer
 from halo.settings import DEFAULT_SCREEN_WIDTH, DEFAULT_SCREEN_HEIGHT
+from tests import TEST_DB
 
 
 class TestDataStore(TestCase):
     def setUp(self):
         TestCase.setUp(self)
-        self.store = DataStore('test.sqlite')
+        self.store = DataStore(TEST_DB)
 
     def test_rw(self):
         """
@@ -18,6 +19,29 @@ class TestDataStore(TestCase):
         self.assertTrue(("City", "AB") in self.store.get_cities(),
                         "Unable to read items written to database")
 
+    def test_shared(self):
+        """
+        Tests that the store of a database is opened only once per process.
+        """
+        self.assertIs(DataStore(TEST_DB), self.store)
+
+    def test_city_ids(self):
+        """
+        Tests remembering the provider id of a city.
+        """
+        self.store.add_city(("Town", "cd"), 42)
+        self.assertEqual(self.store.get_city_ids().get("Town,CD"), 42)
+        self.assertTrue(("Town", "cd") in self.store.get_cities())
+
+    def test_queued_cities(self):
+        """
+        Tests that cities still queued are read without waiting for the writer.
+        """
+        with mock.patch.object(Writer, 'flush', side_effect=AssertionError("Reading must not wait for writes.")):
+            self.store.add_city(("Village", "EF"), 7)
+            self.assertIn(("Village", "EF"), self.store.get_cities())
+            self.assertEqual(self.store.get_city_ids().get("Village,EF"), 7)
+
     def test_settings(self):
         """
         Tests the :class:`DataStore` ability to store settings.
@@ -41,6 +65,25 @@ class TestDataStore(TestCase):
         self.assertEqual(self.store.get_width(), max(DEFAULT_SCREEN_WIDTH, 800))
         self.assertEqual(self.store.get_height(), max(DEFAULT_SCREEN_HEIGHT, 500))
 
+    def test_background_writes(self):
+        """
+        Tests that queued writes reach the disk once flushed.
+        """
+        for width in range(800, 900):
+            self.store.screen(width, 600)
+        self.store.flush()
+        self.store.invalidate()
+        self.assertEqual(self.store.get_width(), 899)
+        self.assertEqual(self.store.get_height(), 600)
+
+    def test_invalidate(self):
+        """
+        Tests that re-reading the settings doesn't bring back the values replaced by queued writes.
+        """
+        self.store.screen(810, 600)
+        self.store.invalidate()
+        self.assertEqual(self.store.get_width(), 810)
+
 
 if __name__ == "__main__":
     main()
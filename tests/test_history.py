@@ -0,0 +1,68 @@
+import os
+import tempfile
+import time
+from unittest import TestCase, main
+
+from halo.History import HistoryStore
+from halo.Series import Observation
+from halo.settings import HISTORY_RAW_DAYS
+
+
+class TestHistoryStore(TestCase):
+    """Tests for :class:`HistoryStore`."""
+    def setUp(self):
+        TestCase.setUp(self)
+        self.store = HistoryStore(os.path.join(tempfile.mkdtemp(), 'history.sqlite'))
+
+    def test_range(self):
+        now = int(time.time())
+        for i in range(5):
+            self.store.record("City, AB", Observation(now - i * 600, 20 + i, 50, 1000, 3, 800, True))
+        self.store.record("Town, CD", Observation(now, 5, 50, 1000, 3, 800, False))
+        self.store.flush()
+
+        series = self.store.get_range("City, AB", now - 1200, now + 1)
+        self.assertEqual(list(series.temp), [22, 21, 20], "Range must be ordered by time.")
+        self.assertEqual(len(self.store.get_last("Town, CD", 60)), 1)
+
+    def test_close(self):
+        location = os.path.join(tempfile.mkdtemp(), 'history.sqlite')
+        store = HistoryStore(location)
+        store.record("City, AB", Observation(int(time.time()), 20, 50, 1000, 3, 800, True))
+        store.close()
+        self.assertEqual(len(HistoryStore(location).get_last("City, AB", 60)), 1, "Queued writes must be kept.")
+
+    def test_compact(self):
+        old = int(time.time()) - (HISTORY_RAW_DAYS + 1) * 86400
+        hour = old - old % 3600
+        for minute in (0, 20, 40):
+            self.store.record("City, AB", Observation(hour + minute * 60, minute, 50, 1000, 3, 800, True))
+        self.store.flush()
+        self.store.compact()
+        self.store.flush()
+
+        series = self.store.get_range("City, AB", hour, hour + 3600)
+        self.assertEqual(len(series), 1, "Old observations must be averaged hourly.")
+        self.assertEqual(series.temp[0], 20)
+        self.store.compact(time.time() + 10 * 365 * 86400)
+        self.store.flush()
+        self.assertEqual(len(self.store.get_range("City, AB", 0, time.time())), 0)
+
+    def test_compact_merge(self):
+        """An hour compacted in two goes is the average of all of its observations."""
+        hour = 1000 * 3600
+        self.store.record("City, AB", Observation(hour, 10, 50, 1000, 3, 800, True))
+        self.store.record("City, AB", Observation(hour + 600, 20, 50, 1000, 3, 800, True))
+        self.store.compact(hour + 1200 + HISTORY_RAW_DAYS * 86400)
+        self.store.record("City, AB", Observation(hour + 1800, 60, 50, 1000, 3, 801, True))
+        self.store.compact(hour + 3600 + HISTORY_RAW_DAYS * 86400)
+        self.store.flush()
+
+        series = self.store.get_range("City, AB", hour, hour + 3600)
+        self.assertEqual(len(series), 1)
+        self.assertEqual(series.temp[0], 30)
+        self.assertEqual(series.code[0], 801)
+
+
+if __name__ == "__main__":
+    main()
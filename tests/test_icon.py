@@ -0,0 +1,18 @@
+from unittest import TestCase, main
+
+from halo.Icon import Icon
+
+
+class TestIcon(TestCase):
+    """Tests for :class:`Icon`."""
+
+    def test_get_icon(self):
+        buff = Icon.get_icon(800, 40)
+        self.assertEqual(buff.get_width(), 40)
+        self.assertIs(Icon.get_icon(800, 40), buff, "Icon was rendered again instead of served from cache.")
+        self.assertIsNot(Icon.get_icon(800, 41), buff)
+        self.assertEqual(Icon.get_icon(800, 40, 2).get_width(), 80, "Icon must be rendered for the scale factor.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import concurrent.futures
 from unittest import TestCase, main
 
 from halo.Place import PlaceDialog
@@ -22,6 +23,16 @@ class TestPlaceDialog(TestCase):
             self.assertEqual(btn.get_label(), self.dialogue.get_city(),
                              "Button label and entry mismatch")
 
+    def test_destroyed(self):
+        """Results arriving once the dialog is gone must be dropped."""
+        future = concurrent.futures.Future()
+        future.set_result([])
+        self.dialogue.place.set_text("lon")
+        self.dialogue.suggestions.append(["London, GB", 2643743])
+        self.dialogue.destroy()
+        self.dialogue.show_suggestions("lon", future)
+        self.assertEqual(len(self.dialogue.suggestions), 1)
+
 
 if __name__ == "__main__":
     main()
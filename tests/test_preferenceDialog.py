@@ -1,13 +1,14 @@
 from unittest import TestCase
 from halo.Preference import PreferenceDialog
 from halo import settings
+from tests import TEST_DB
 
 import gi
 gi.require_version("Gtk", "3.0")
 from gi.repository import Gtk  # noqa: E402
 
 
-settings.DEFAULT_DB_LOCATION = 'test.sqlite'
+settings.DEFAULT_DB_LOCATION = TEST_DB
 
 
 class TestPreferenceDialog(TestCase):
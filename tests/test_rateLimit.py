@@ -0,0 +1,57 @@
+from unittest import TestCase, main
+
+from halo.DataStore import DataStore
+from halo.RateLimit import TokenBucket, RequestBudget
+from tests import TEST_DB
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateLimit(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.clock = Clock()
+        self.store = DataStore(TEST_DB)
+        self.store.set_request_usage('', 0)
+
+    def test_token_bucket(self):
+        """Tokens are spent down to zero and refilled over time up to the capacity."""
+        bucket = TokenBucket(1, 2, self.clock)
+        self.assertTrue(bucket.try_acquire())
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+        self.clock.now = 1
+        self.assertTrue(bucket.try_acquire())
+        self.clock.now = 10
+        self.assertEqual(bucket.tokens, 2)
+
+    def test_budget(self):
+        """The daily usage is kept across restarts and limits requests along with the minute budget."""
+        budget = RequestBudget(per_minute=10, per_day=3, reserve=0.5, clock=self.clock, store=self.store)
+        self.assertTrue(budget.acquire())
+        self.assertTrue(budget.acquire())
+        self.assertEqual(budget.remaining(), (8, 1))
+        self.assertTrue(budget.is_low())
+
+        budget = RequestBudget(per_minute=10, per_day=3, clock=self.clock, store=self.store)
+        self.assertTrue(budget.acquire())
+        self.assertFalse(budget.acquire())
+        self.assertEqual(self.store.get_request_usage(), (RequestBudget.today(), 3))
+
+    def test_exhaust(self):
+        """A rate limit reported by the provider spends the minute."""
+        budget = RequestBudget(per_minute=10, per_day=100, clock=self.clock, store=self.store)
+        budget.exhaust()
+        self.assertFalse(budget.acquire())
+        self.clock.now = 6
+        self.assertTrue(budget.acquire())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+from unittest import TestCase, main
+
+from halo.Retry import RetryPolicy, CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestRetry(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.clock = Clock()
+        self.calls = 0
+
+    def failing(self, times):
+        self.calls += 1
+        if self.calls <= times:
+            raise ConnectionError("down")
+        return self.calls
+
+    def test_retry(self):
+        """Calls are retried after growing delays until they succeed or the retries are used up."""
+        policy = RetryPolicy(retries=2, base_delay=1, max_delay=10, retry_on=(ConnectionError,),
+                             sleep=self.clock.sleep, clock=self.clock)
+        self.assertEqual(policy.call(self.failing, 2), 3)
+        self.assertLessEqual(self.clock.now, 1 + 2)
+        self.calls = 0
+        with self.assertRaises(ConnectionError):
+            policy.call(self.failing, 3)
+        self.assertEqual(self.calls, 3)
+
+    def test_not_retried(self):
+        """Exceptions not listed are raised right away."""
+        policy = RetryPolicy(retry_on=(KeyError,), sleep=self.clock.sleep, clock=self.clock)
+        with self.assertRaises(ConnectionError):
+            policy.call(self.failing, 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_deadline(self):
+        """No retry is started past the deadline."""
+        policy = RetryPolicy(retries=5, base_delay=10, max_delay=10, deadline=0.01, retry_on=(ConnectionError,),
+                             sleep=self.clock.sleep, clock=self.clock)
+        policy.delay = lambda attempt: 1
+        with self.assertRaises(ConnectionError):
+            policy.call(self.failing, 5)
+        self.assertEqual(self.calls, 1)
+
+    def test_jitter(self):
+        """Delays are random but never above the backoff of the attempt or the maximum."""
+        policy = RetryPolicy(base_delay=1, max_delay=3)
+        for attempt in range(5):
+            self.assertLessEqual(policy.delay(attempt), min(3, 2 ** attempt))
+
+    def test_circuit(self):
+        """The circuit opens after consecutive failures and a probe decides whether it closes again."""
+        circuit = CircuitBreaker(failures=2, reset_timeout=10, clock=self.clock)
+        circuit.record_failure()
+        self.assertTrue(circuit.allow())
+        circuit.record_failure()
+        self.assertTrue(circuit.is_open())
+        self.assertFalse(circuit.allow())
+
+        self.clock.now = 10
+        self.assertTrue(circuit.allow())
+        self.assertEqual(circuit.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(circuit.allow())
+        circuit.record_failure()
+        self.assertFalse(circuit.allow())
+
+        self.clock.now = 20
+        self.assertTrue(circuit.allow())
+        circuit.record_success()
+        self.assertEqual(circuit.state, CircuitBreaker.CLOSED)
+
+    def test_lost_probe(self):
+        """A probe that never reports back must not keep the circuit refusing calls."""
+        circuit = CircuitBreaker(failures=1, reset_timeout=10, clock=self.clock)
+        circuit.record_failure()
+        self.clock.now = 10
+        self.assertTrue(circuit.allow())
+        self.clock.now = 15
+        self.assertFalse(circuit.allow())
+        self.clock.now = 20
+        self.assertTrue(circuit.allow())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import time
+from unittest import TestCase, mock, main
+
+from halo.API import OpenWeatherMap, APIError, RateLimitReached
+from halo.AsyncAPI import AsyncAPI, EventLoop
+from halo.Cache import ResponseCache
+from halo.History import HistoryStore
+from halo.Scheduler import RefreshScheduler
+from halo.settings import SCHEDULE_MAX_BACKOFF, HISTORY_COMPACT_INTERVAL
+from tests import test_API, reset_stores
+
+
+class TestRefreshScheduler(TestCase):
+    """Tests for :class:`RefreshScheduler`, driving single refreshes by hand."""
+    def setUp(self):
+        TestCase.setUp(self)
+        reset_stores()
+        self.refreshed = []
+        self.api = AsyncAPI(OpenWeatherMap(ResponseCache(':memory:')), EventLoop.get_default())
+        test_API.fresh_budget()
+        self.scheduler = RefreshScheduler(self.api, self.refreshed.append)
+
+    def refresh(self, name):
+        self.api.submit(self.scheduler.refresh(name)).result(5)
+
+    def test_next_due(self):
+        self.assertIsNone(self.scheduler.next_due())
+        self.scheduler.set_active("Kochi,IN")
+        at, name = self.scheduler.next_due()
+        self.assertEqual(name, RefreshScheduler.ACTIVE)
+        self.assertAlmostEqual(at, time.time() + self.scheduler.intervals[name], delta=1)
+
+    @mock.patch('requests.Session.get', side_effect=test_API.mock_request)
+    def test_refresh_active(self, mock_get):
+        test_API.MOCK_DATA = test_API.current
+        self.scheduler.set_active("Kochi,IN")
+        with mock.patch.object(OpenWeatherMap, 'get_forecast_weather'):
+            self.refresh(RefreshScheduler.ACTIVE)
+        self.assertEqual(self.refreshed, ["Kochi,IN"])
+        self.assertFalse(self.api.api.stale_while_revalidate)
+
+    def test_backoff(self):
+        self.scheduler.set_active("Kochi,IN")
+        interval = self.scheduler.intervals[RefreshScheduler.ACTIVE]
+        with mock.patch.object(OpenWeatherMap, 'get_current_weather', side_effect=APIError("down")):
+            self.refresh(RefreshScheduler.ACTIVE)
+            self.assertAlmostEqual(self.scheduler.next_due()[0], time.time() + 2 * interval, delta=1)
+            self.refresh(RefreshScheduler.ACTIVE)
+            self.assertAlmostEqual(self.scheduler.next_due()[0], time.time() + 4 * interval, delta=1)
+        self.assertEqual(self.refreshed, [])
+
+    def test_rate_limit(self):
+        self.scheduler.set_active("Kochi,IN")
+        with mock.patch.object(OpenWeatherMap, 'get_current_weather', side_effect=RateLimitReached("limit")):
+            self.refresh(RefreshScheduler.ACTIVE)
+        self.assertAlmostEqual(self.scheduler.next_due()[0], time.time() + SCHEDULE_MAX_BACKOFF, delta=1)
+
+
+    def test_compact(self):
+        HistoryStore()  # Compacts once when it's opened.
+        with mock.patch.object(HistoryStore, 'compact') as compact:
+            self.refresh(RefreshScheduler.COMPACT)
+        compact.assert_called_once_with()
+        at, name = self.scheduler.next_due()
+        self.assertEqual(name, RefreshScheduler.COMPACT)
+        self.assertAlmostEqual(at, time.time() + HISTORY_COMPACT_INTERVAL, delta=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+from unittest import TestCase, main
+
+from halo.Series import WeatherSeries
+from tests.test_API import forecast_data
+
+
+class TestWeatherSeries(TestCase):
+    """Tests for :class:`WeatherSeries`."""
+
+    def test_from_items(self):
+        series = WeatherSeries.from_items(forecast_data['list'])
+        self.assertEqual(len(series), 40)
+        first = series[0]
+        self.assertEqual(first.dt, 1573992000)
+        self.assertEqual(first.temp, 33.1)
+        self.assertEqual(first.humidity, 78)
+        self.assertEqual(first.pressure, 1010)
+        self.assertEqual(first.wind, 4.09)
+        self.assertEqual(first.code, 500)
+        self.assertTrue(first.day)
+        self.assertFalse(series[1].day)
+
+    def test_aggregates(self):
+        series = WeatherSeries()
+        self.assertIsNone(series.temp_range())
+        self.assertEqual(series.mean_temp(), 0)
+        for temp in (10, 20, 30):
+            series.append(0, temp)
+        self.assertEqual(series.temp_range(), (10, 30))
+        self.assertEqual(series.mean_temp(), 20)
+        self.assertEqual([o.temp for o in series], [10, 20, 30])
+
+
+if __name__ == "__main__":
+    main()
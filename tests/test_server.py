@@ -0,0 +1,102 @@
+import asyncio
+import http.client
+import threading
+from unittest import TestCase, mock, main
+
+import requests
+
+from halo.API import API, OpenWeatherMap, RemoteProvider, NotFound
+from halo.Cache import ResponseCache
+from halo.Retry import CircuitBreaker
+from halo.Server import WeatherServer
+from tests import test_API, reset_stores
+
+
+class TestServer(TestCase):
+    """Runs the server on a free port and queries it over http."""
+    def setUp(self):
+        TestCase.setUp(self)
+        reset_stores()
+        API.configure_circuit(CircuitBreaker())
+        test_API.fresh_budget()
+        self.server = WeatherServer(OpenWeatherMap(ResponseCache(':memory:')), port=0)
+        self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(self.server.start())
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        async def shutdown():
+            self.server.close()
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        self.loop.close()
+        TestCase.tearDown(self)
+
+    def get(self, connection, path, headers=None):
+        connection.request("GET", path, headers=headers or {})
+        response = connection.getresponse()
+        return response, response.read()
+
+    @mock.patch('requests.Session.get', side_effect=test_API.mock_request)
+    def test_etag(self, mock_get):
+        """Responses are served from cache over a kept alive connection and revalidated by their ETag."""
+        test_API.MOCK_DATA = test_API.forecast_data
+        connection = http.client.HTTPConnection("127.0.0.1", self.server.port, timeout=5)
+        response, body = self.get(connection, "/forecast?q=Thrissur,IN")
+        self.assertEqual(response.status, 200)
+        etag = response.getheader("ETag")
+        self.assertIsNotNone(etag)
+
+        response, body = self.get(connection, "/forecast?q=Thrissur,IN", {"If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b'')
+        self.assertEqual(mock_get.call_count, 1)
+
+        response, body = self.get(connection, "/unknown?q=Thrissur,IN")
+        self.assertEqual(response.status, 404)
+        connection.close()
+
+    @mock.patch('requests.Session.get', side_effect=test_API.mock_request)
+    def test_query_encoded(self, mock_get):
+        """Parameters smuggled into the city name must not reach the upstream request."""
+        test_API.MOCK_DATA = test_API.forecast_data
+        connection = http.client.HTTPConnection("127.0.0.1", self.server.port, timeout=5)
+        response, body = self.get(connection, "/forecast?q=Thrissur%26appid%3DX%26units%3Dimperial")
+        self.assertEqual(response.status, 200)
+        url = mock_get.call_args[0][0]
+        self.assertIn("q=Thrissur%26appid%3DX%26units%3Dimperial&", url)
+        self.assertNotIn("units=imperial", url)
+        connection.close()
+
+    def test_remote_provider(self):
+        """A remote provider gets the data of the upstream provider through the server."""
+        base = "http://127.0.0.1:%d" % self.server.port
+        session = requests.Session()
+
+        def route(url, **kwargs):
+            # Requests to the server go out for real, the ones of the server to the provider are mocked.
+            if url.startswith(base):
+                return session.request("GET", url, **kwargs)
+            return test_API.mock_request(url, **kwargs)
+
+        test_API.MOCK_DATA = test_API.current
+        remote = RemoteProvider(ResponseCache(':memory:'), base)
+        with mock.patch('requests.Session.get', side_effect=route):
+            city, city_tz, weather = remote.get_current_weather("London,GB")
+            self.assertEqual(weather['code'], 300)
+            with self.assertRaises(NotFound):
+                remote.get_current_weather("ip=0.0.0.1")
+            history = remote.get_weather_history("London,GB", "Europe/London")
+            self.assertEqual(len(history), 0)
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import threading
+import time
+from unittest import TestCase, main
+
+from halo.SingleFlight import SingleFlight
+
+
+class TestSingleFlight(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.flight = SingleFlight()
+        self.calls = 0
+
+    def slow(self, value):
+        self.calls += 1
+        time.sleep(0.1)
+        if value is None:
+            raise ValueError("no value")
+        return value
+
+    def run_together(self, key, value, count=3):
+        results = []
+
+        def call():
+            try:
+                results.append(self.flight.do(key, self.slow, value))
+            except ValueError as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_shared_result(self):
+        """Identical calls in flight at the same time run once and share the result."""
+        self.assertEqual(self.run_together("a", 42), [42, 42, 42])
+        self.assertEqual(self.calls, 1)
+        self.assertFalse(self.flight.in_flight("a"))
+
+    def test_shared_error(self):
+        """Every caller gets the exception of the call."""
+        results = self.run_together("a", None)
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(self.calls, 1)
+
+    def test_later_call(self):
+        """A call made after the previous one completed runs again."""
+        self.flight.do("a", self.slow, 1)
+        self.flight.do("a", self.slow, 1)
+        self.assertEqual(self.calls, 2)
+
+
+if __name__ == "__main__":
+    main()
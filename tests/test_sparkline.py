@@ -0,0 +1,32 @@
+from unittest import TestCase, main
+
+from halo.Sparkline import Sparkline, nearest_index
+
+
+class TestSparkline(TestCase):
+    """Tests for :class:`Sparkline`."""
+    def setUp(self):
+        TestCase.setUp(self)
+        self.hovered = []
+        self.chart = Sparkline(self.hovered.append)
+
+    def test_index_at(self):
+        self.assertIsNone(self.chart.index_at(10))
+        self.chart.set_values([3, 1, 4, 1, 5])
+        self.chart.xs = [40, 50, 60, 70, 80]
+        self.assertEqual(self.chart.index_at(0), 0)
+        self.assertEqual(self.chart.index_at(54), 1)
+        self.assertEqual(self.chart.index_at(56), 2)
+        self.assertEqual(self.chart.index_at(500), 4)
+
+    def test_nearest_index(self):
+        xs = [0, 10, 25, 40]
+        self.assertIsNone(nearest_index([], 3))
+        self.assertEqual(nearest_index(xs, -4), 0)
+        self.assertEqual(nearest_index(xs, 16), 1)
+        self.assertEqual(nearest_index(xs, 19), 2)
+        self.assertEqual(nearest_index(xs, 99), 3)
+
+
+if __name__ == "__main__":
+    main()
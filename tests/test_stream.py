@@ -0,0 +1,50 @@
+import json
+from unittest import TestCase, main
+
+from halo.Stream import iter_array
+from tests.test_API import forecast_data
+
+
+class TestStream(TestCase):
+    """Tests the incremental json parser."""
+
+    def test_chunks(self):
+        text = json.dumps(forecast_data).encode()
+        for size in (1, 7, 4096):
+            chunks = [text[i:i + size] for i in range(0, len(text), size)]
+            self.assertEqual(list(iter_array(chunks, 'list')), forecast_data['list'])
+
+    def test_top_level_key(self):
+        doc = '{"a": {"list": [1]}, "s": "\\"list\\": [2]", "list": [{"x": "é"}, [3]], "z": 4}'.encode()
+        self.assertEqual(list(iter_array([doc[i:i + 1] for i in range(len(doc))], 'list')), [{"x": "é"}, [3]])
+
+    def test_document_array(self):
+        doc = ' [{"id": 1}, {"id": 2}]'
+        self.assertEqual(list(iter_array([doc[i:i + 3] for i in range(0, len(doc), 3)], None)), [{"id": 1}, {"id": 2}])
+
+    def test_split_scalars(self):
+        doc = '{"list": [12345, 1.5, true, null, -2e10]}'
+        for size in range(1, len(doc)):
+            chunks = [doc[:size], doc[size:]]
+            self.assertEqual(list(iter_array(chunks, 'list')), [12345, 1.5, True, None, -2e10])
+        self.assertEqual(list(iter_array(['[1', '2', '3]'], None)), [123])
+
+    def test_missing(self):
+        self.assertEqual(list(iter_array(['{"cod": "404"}'], 'list')), [])
+        with self.assertRaises(ValueError):
+            list(iter_array(['{"list": [{"a": 1}, {"b"'], 'list'))
+
+    def test_drains_source(self):
+        consumed = []
+
+        def source():
+            yield '{"list": [1], '
+            yield '"rest": 2}'
+            consumed.append(True)
+
+        self.assertEqual(list(iter_array(source(), 'list')), [1])
+        self.assertEqual(consumed, [True])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,17 @@
-from unittest import TestCase
+import importlib.util
+from unittest import TestCase, skipUnless
 
+from halo.Series import WeatherSeries
 from halo.SummaryView import SummaryView
 
 
+def series(temperatures) -> WeatherSeries:
+    weather = WeatherSeries()
+    for i, temp in enumerate(temperatures):
+        weather.append(1501970516 + i * 3600, temp)
+    return weather
+
+
 class TestSummaryView(TestCase):
 
     def setUp(self):
@@ -11,7 +20,7 @@ class TestSummaryView(TestCase):
         self.forecast = SummaryView()
 
     def test_render(self):
-        weather_data = [{
+        weather_data = WeatherSeries.from_items([{
             'main':
                 {
                     'temp': 25,
@@ -21,11 +30,11 @@ class TestSummaryView(TestCase):
                 "icon": '10d'
             }],
             "dt": 1501970516,
-        }]
-        self.historic.render(weather_data, list(range(24)))
+        }])
+        self.historic.render(weather_data)
         self.assertEqual(self.historic.items[0][1].get_text(), "Yesterday")
 
-        weather_data = [{
+        weather_data = WeatherSeries.from_items([{
             'main':
                 {
                     'temp': 25,
@@ -35,5 +44,26 @@ class TestSummaryView(TestCase):
                 "icon": '10d'
             }],
             "dt": 1501970516,
-        } for _ in range(5)]
-        self.forecast.render(weather_data, list(range(24)))
+        } for _ in range(5)])
+        self.forecast.render(weather_data)
+
+    @skipUnless(importlib.util.find_spec('matplotlib'), 'matplotlib not installed')
+    def test_enable_chart(self):
+        forecast = SummaryView(backend='matplotlib')
+        forecast.render(series(range(24)))
+        self.assertIsNone(forecast.canvas, "Chart must not be created before matplotlib is loaded.")
+        forecast.enable_chart()
+        self.assertIsNotNone(forecast.canvas)
+        self.assertEqual(len(forecast.axis.lines), 1)
+
+    def test_cairo_chart(self):
+        forecast = SummaryView(backend='cairo')
+        forecast.render(series(range(24)))
+        self.assertEqual(forecast.canvas.values, list(range(24)))
+        forecast.show_value(3)
+        self.assertTrue(forecast.label.get_text().startswith("3"))
+        forecast.label.set_text("unchanged")
+        forecast.show_value(3)
+        self.assertEqual(forecast.label.get_text(), "unchanged", "Label must only change with the hovered index.")
+        forecast.hide_label()
+        self.assertEqual(forecast.label.get_text(), "")
@@ -0,0 +1,44 @@
+from datetime import datetime
+from unittest import TestCase, main
+
+import pytz
+
+from halo.Timezone import parse_coordinates, resolve_timezone, get_tzinfo, ZoneIndex
+
+
+class TestTimezone(TestCase):
+    def test_parse_coordinates(self):
+        self.assertEqual(parse_coordinates("+4230+00131"), (42.5, 1 + 31 / 60))
+        lat, lon = parse_coordinates("-332510+1511521")
+        self.assertAlmostEqual(lat, -(33 + 25 / 60 + 10 / 3600))
+        self.assertAlmostEqual(lon, 151 + 15 / 60 + 21 / 3600)
+
+    def test_nearest(self):
+        index = ZoneIndex.get_default()
+        self.assertEqual(index.nearest(48.85, 2.35).name, "Europe/Paris")
+        self.assertEqual(index.nearest(-33.87, 151.2, lambda zone: zone.country == 'AU').name, "Australia/Sydney")
+        self.assertIsNone(index.nearest(0, 0, lambda zone: False))
+
+    def test_multi_zone_country(self):
+        """Cities of countries spanning many zones get the zone they are in, not the first of the country."""
+        self.assertEqual(resolve_timezone(34.05, -118.24, None, 'US'), "America/Los_Angeles")
+        self.assertEqual(resolve_timezone(41.88, -87.63, None, 'us'), "America/Chicago")
+        self.assertEqual(resolve_timezone(10.52, 76.21, 19800, 'IN'), "Asia/Kolkata")
+
+    def test_offset(self):
+        """The offset reported rules out zones on the wrong side of a border."""
+        offset = int(pytz.timezone("America/New_York").utcoffset(datetime.utcnow()).total_seconds())
+        self.assertEqual(resolve_timezone(40.71, -74.0, offset, 'US'), "America/New_York")
+
+    def test_fallbacks(self):
+        self.assertEqual(resolve_timezone(None, None, None, 'GB'), "Europe/London")
+        self.assertEqual(resolve_timezone(None, None, 3600, None), "Etc/GMT-1")
+        self.assertEqual(resolve_timezone(None, None, None, 'XX'), "UTC")
+
+    def test_tzinfo(self):
+        self.assertIs(get_tzinfo("Europe/London"), get_tzinfo("Europe/London"))
+        self.assertIs(get_tzinfo("Nowhere/Unknown"), pytz.utc)
+
+
+if __name__ == "__main__":
+    main()